@@ -0,0 +1,127 @@
+import argparse
+import glob
+import math
+import os
+import threading
+import time
+
+import cv2
+
+from main import play
+from mockOctoprint import MockOctoprint
+from motionQueue import MotionQueue
+from moveDetection import MoveDetector
+from octoprint import Octoprint
+from positionCache import PositionCache
+
+
+class ReplaySource:
+
+    '''
+    A cv2.VideoCapture-like source that plays one recorded clip per human turn
+    The first clip shows the board before the game (used for calibration), every following clip
+    starts with the board after the robot parked and ends after the human's move.
+    Frames are paced at the clip's frame rate. When a clip is over, its last frame is repeated
+    (the board is still) until advance() starts the next clip; after the last clip the stream ends.
+    '''
+    def __init__(self, clips, fps=None):
+        self.clips = clips
+        self.fps = fps
+        self.lock = threading.Lock()
+        self.index = -1
+        self.cap = None
+        self.last = None
+        self.nextTime = None
+        self.finished = False
+        self.advance()
+
+    '''
+    Starts the next clip
+    '''
+    def advance(self):
+        with self.lock:
+            if self.cap is not None:
+                self.cap.release()
+            self.index += 1
+            if self.index >= len(self.clips):
+                self.cap = None
+                self.finished = True
+                return
+            self.cap = cv2.VideoCapture(self.clips[self.index])
+            self.interval = 1/(self.fps or self.cap.get(cv2.CAP_PROP_FPS) or 15)
+
+    def read(self):
+        now = time.time()
+        if self.nextTime is not None and self.nextTime > now:
+            time.sleep(self.nextTime - now)
+        with self.lock:
+            self.nextTime = max(now, self.nextTime or now) + self.interval
+            if self.finished:
+                return False, None
+            ref, frame = self.cap.read()
+            if ref:
+                self.last = frame
+            return self.last is not None, self.last
+
+
+'''
+Returns the p-th percentile (0-100) of a list of values (nearest rank)
+'''
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered), max(1, math.ceil(p/100*len(ordered))))-1]
+
+
+'''
+Prints the latency percentiles of every phase
+'''
+def report(timings):
+    print('%-10s %6s %8s %8s %8s %8s' % ('phase', 'turns', 'p50', 'p90', 'p99', 'max'))
+    for phase in ('wait', 'detection', 'search', 'motion'):
+        values = [t[phase] for t in timings if phase in t]
+        if not values:
+            continue
+        print('%-10s %6d %8.3f %8.3f %8.3f %8.3f' % (phase, len(values), percentile(values, 50),
+              percentile(values, 90), percentile(values, 99), max(values)))
+
+
+'''
+Replays a recorded game offline and returns the timings of every turn (see main.play)
+The recording is a directory with one video clip per human turn (sorted by name, the first one
+shows the board before the game) and a file moves.txt with the robot's moves, one per line (like e7e5).
+The printer is simulated by a local mock Octoprint.
+'''
+def replay(recording, timeScale=1.0, budget=1, fps=None, cache=None):
+    clips = sorted(path for path in glob.glob(os.path.join(recording, '*'))
+                   if os.path.splitext(path)[1].lower() in ('.mp4', '.avi', '.mkv', '.mjpeg', '.mov'))
+    with open(os.path.join(recording, 'moves.txt')) as f:
+        robotMoves = iter([line.strip() for line in f if line.strip()])
+
+    mock = MockOctoprint(job_time=None, time_scale=timeScale).start()
+    source = ReplaySource(clips, fps)
+    md = MoveDetector(source)
+    o = Octoprint(host=mock.url, wait='poll', poll_interval=0.05)
+    q = MotionQueue(o)
+    try:
+        q.park()
+        return play(md, q, cache, budget, robot_moves=robotMoves, on_human_turn=source.advance)
+    finally:
+        q.shutdown()
+        md.close()
+        mock.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Replays recorded games against a mock printer and reports per-turn latencies.')
+    parser.add_argument('recordings', nargs='+', help='directories with one clip per human turn and moves.txt')
+    parser.add_argument('--time-scale', type=float, default=1.0, help='factor for the simulated motion times')
+    parser.add_argument('--budget', type=float, default=1, help='search time per move in seconds')
+    parser.add_argument('--fps', type=float, help='replay frame rate (default: the frame rate of the clips)')
+    parser.add_argument('--cache', help='position cache file to use (default: none, every search starts cold)')
+    args = parser.parse_args()
+
+    cache = PositionCache(args.cache) if args.cache else None
+    timings = []
+    for recording in args.recordings:
+        timings += replay(recording, args.time_scale, args.budget, args.fps, cache)
+    report(timings)
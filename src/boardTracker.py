@@ -0,0 +1,67 @@
+import numpy as np
+import cv2
+
+
+class BoardTracker:
+
+    '''
+    Follows small movements of the chess board in the camera image (a bumped camera or board)
+    without detecting the board again.
+    Remembers corner features on and around the board in a reference frame and tracks them
+    into later frames with pyramidal Lucas-Kanade optical flow. A homography fitted to the tracked
+    features (RANSAC, so moved pieces and hands are ignored) moves the board's corners along.
+    The confidence is the share of features that agree with the homography; if it is too low,
+    tracking can't be trusted and the board has to be detected again.
+    When the board didn't move but features got lost (e.g. pieces were moved), the reference is renewed.
+    Needs the corners of the board (upper left, upper right, lower left, lower right) and a frame they belong to
+    '''
+    def __init__(self, corners, frame, maxFeatures=120, minShift=0.5, minConfidence=0.5, refreshConfidence=0.8, minInliers=12):
+        self.maxFeatures = maxFeatures
+        self.minShift = minShift
+        self.minConfidence = minConfidence
+        self.refreshConfidence = refreshConfidence
+        self.minInliers = minInliers
+        self.reset(corners, frame)
+
+    '''
+    Uses frame as new reference for the given corners
+    '''
+    def reset(self, corners, frame):
+        self.corners = np.float32(corners)
+        self.reference = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+        #only look at the board and a small border around it (corners are ordered ul, ur, ll, lr)
+        mask = np.zeros(self.reference.shape, np.uint8)
+        outline = self.corners[[0, 1, 3, 2]].astype(np.int32)
+        cv2.fillConvexPoly(mask, outline, 255)
+        mask = cv2.dilate(mask, np.ones((9, 9), np.uint8))
+
+        self.features = cv2.goodFeaturesToTrack(self.reference, self.maxFeatures, 0.01, 5, mask=mask)
+
+    '''
+    Tracks the board into frame
+    Returns (corners, confidence); corners is None if the board didn't move by more than minShift px
+    '''
+    def track(self, frame):
+        if self.features is None or len(self.features) < self.minInliers:
+            return None, 0.0
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(self.reference, gray, self.features, None,
+                                                    winSize=(15, 15), maxLevel=2)
+        found = status.ravel() == 1
+        if found.sum() < self.minInliers:
+            return None, 0.0
+
+        homography, inliers = cv2.findHomography(self.features[found], moved[found], cv2.RANSAC, 1.0)
+        if homography is None:
+            return None, 0.0
+        confidence = inliers.sum()/len(self.features)
+        if inliers.sum() < self.minInliers:
+            return None, 0.0
+
+        corners = cv2.perspectiveTransform(self.corners.reshape(-1, 1, 2), homography).reshape(-1, 2)
+        if np.abs(corners - self.corners).max() < self.minShift:
+            if self.minConfidence <= confidence < self.refreshConfidence:
+                self.reset(self.corners, frame)
+            return None, confidence
+        return corners, confidence
@@ -0,0 +1,30 @@
+"""Persists calibration data between runs, so startup doesn't have to detect the board again.
+
+The calibration is a JSON file with one section per component, e.g.
+    {"camera": {"width": 320, "height": 240, "corners": [...], ...}, "printer": {"a1": [26, 38], "field_size": 27}}
+"""
+import json
+import os
+
+
+def load(path, section=None):
+    """Returns the calibration (or one section of it) stored in path, or None if there is none."""
+    if path is None or not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        print('Ignoring calibration %s: %s' % (path, e))
+        return None
+    return data.get(section) if section is not None else data
+
+
+def save(path, section, values):
+    """Replaces one section of the calibration in path. The file is replaced atomically."""
+    data = load(path) or {}
+    data[section] = values
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
@@ -0,0 +1,328 @@
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import count
+from sunfish import Searcher, Position, initial, parse, MATE_UPPER, EVAL_ROUGHNESS
+import metrics
+
+
+class SearchAborted(Exception):
+    pass
+
+
+class InterruptibleSearcher(Searcher):
+
+    def __init__(self):
+        """A sunfish Searcher that can be stopped from another thread (abort) or at a point in time (deadline).
+
+        Stopping raises SearchAborted out of search(). The best moves found up to then (tp_move) stay valid
+        and are tried first by the next search; the scores (tp_score) are cleared by every search.
+        """
+        super().__init__()
+        self.abort = threading.Event()
+        self.deadline = None
+
+    def bound(self, *args, **kwargs):
+        #checking the clock for every node is too expensive
+        if self.nodes & 1023 == 0:
+            if self.abort.is_set() or (self.deadline is not None and time.time() > self.deadline):
+                raise SearchAborted()
+        return super().bound(*args, **kwargs)
+
+
+def think(searcher, pos, hist, budget=1, pondered=None, cache=None):
+    """Searches the best move in pos for budget seconds. Returns (depth, move, score) of the deepest finished iteration.
+
+    searcher -- an InterruptibleSearcher, the best moves it found before are tried first
+    pos -- the position to search, from the perspective of the side to move
+    hist -- the positions of the game so far (for repetition detection)
+    budget -- how long to search in seconds
+    pondered -- what Ponderer.stop returned: (result, seconds) if this position was pondered, otherwise None
+    cache -- a PositionCache; book moves are played without searching, other cached moves are tried first,
+             and the result is stored in the cache
+    """
+    entry = cache.get(pos) if cache is not None else None
+    if entry is not None and entry.move not in pos.gen_moves():
+        #a key collision, or a cache of a different sunfish version
+        entry = None
+    if entry is not None and entry.book:
+        return (entry.depth, entry.move, entry.score)
+    if entry is not None:
+        searcher.tp_move[pos] = entry.move
+
+    result = None
+    if pondered is not None:
+        result, elapsed = pondered
+        metrics.count('ponder_hits')
+        if result is not None and elapsed >= budget:
+            #we already thought about this position long enough
+            return result
+        budget -= elapsed
+
+    start = time.time()
+    searcher.deadline = None
+    with metrics.span('search'):
+        try:
+            for depth, move, score in searcher.search(pos, hist):
+                if result is None or depth >= result[0]:
+                    result = (depth, move, score)
+                #finish at least one iteration, then stop exactly at the deadline
+                searcher.deadline = start + budget
+                if time.time() - start > budget:
+                    break
+        except SearchAborted:
+            pass
+        finally:
+            searcher.deadline = None
+    if result is not None:
+        metrics.gauge('search_depth', result[0])
+    metrics.gauge('search_nodes', searcher.nodes)
+    metrics.count('search_nodes', searcher.nodes)
+    if cache is not None and result is not None and result[1] is not None:
+        cache.put(pos, result[1], result[2], result[0])
+    return result
+
+
+#the searcher of a worker process in a process pool, see search_worker
+_workerSearcher = None
+
+
+def search_worker(pos, hist, budget, hint=None):
+    """Runs think() in a worker process of a process pool. Every worker keeps its own searcher,
+    so the best moves it found are tried first in all the searches it runs.
+
+    hint -- a move to try first (e.g. from a PositionCache)
+    """
+    global _workerSearcher
+    if _workerSearcher is None:
+        _workerSearcher = InterruptibleSearcher()
+    if hint is not None:
+        _workerSearcher.tp_move[pos] = hint
+    return think(_workerSearcher, pos, hist, budget)
+
+
+def bisect(searcher, pos, depth, lower=-MATE_UPPER, upper=MATE_UPPER):
+    """Returns the score of pos at depth, known to be between lower and upper, by a series of null window
+    searches like sunfish's own search does at the root (up to EVAL_ROUGHNESS below the exact score)."""
+    while lower < upper - EVAL_ROUGHNESS:
+        gamma = (lower+upper+1)//2
+        score = searcher.bound(pos, gamma, depth, root=False)
+        if score >= gamma:
+            lower = score
+        if score < gamma:
+            upper = score
+    return lower
+
+
+#the searcher of a worker process of a ParallelSearcher and the search it last worked on, see split_worker
+_splitSearcher = None
+_splitKey = None
+
+
+def split_worker(key, pos, hist, move, depth, gamma, deadline=None):
+    """Tests in a worker process whether a root move of pos scores more than gamma at depth (both seen from pos).
+    Returns (score, nodes): the score of the move if it is better than gamma, otherwise None.
+    Raises SearchAborted at the deadline.
+
+    key -- identifies the root search; the scores the worker found for earlier tasks of the same search are reused,
+           the best moves it found are kept for all later searches
+    """
+    global _splitSearcher, _splitKey
+    if _splitSearcher is None:
+        _splitSearcher = InterruptibleSearcher()
+    searcher = _splitSearcher
+    if key != _splitKey:
+        #the scores depend on the history, like in sunfish's search
+        searcher.tp_score.clear()
+        searcher.history = set(hist)
+        _splitKey = key
+    searcher.nodes = 0
+    searcher.deadline = deadline
+    child = pos.move(move)
+    try:
+        #the child is searched from the opponent's side, one ply less deep
+        score = searcher.bound(child, -gamma, depth-1, root=False)
+        if score >= -gamma:
+            return None, searcher.nodes
+        return -bisect(searcher, child, depth-1, upper=score), searcher.nodes
+    finally:
+        searcher.deadline = None
+
+
+class ParallelSearcher:
+
+    def __init__(self, workers=None, cache=None):
+        """Searches on several cores by splitting the root moves between worker processes (PV splitting).
+
+        Every depth first searches the best move of the last depth in this process. Then the workers only test
+        whether the other root moves are better (null window searches, which mostly cut off early);
+        the few that are get their exact score. The deepest depth that finished before the deadline counts,
+        the first one always finishes.
+        This process and the workers keep the best moves they found between searches.
+
+        workers -- number of worker processes (default: number of cores)
+        cache -- a PositionCache, used like in think
+        """
+        self.workers = workers or os.cpu_count()
+        self.executor = ProcessPoolExecutor(self.workers)
+        self.cache = cache
+        self.searcher = InterruptibleSearcher()
+        self.searches = 0
+        self.nodes = 0
+
+    def search(self, pos, hist, budget=1):
+        """Same as think, but on all workers. Returns (depth, move, score), or None if there is no legal move."""
+        entry = self.cache.get(pos) if self.cache is not None else None
+        if entry is not None and entry.book and entry.move in pos.gen_moves():
+            return (entry.depth, entry.move, entry.score)
+
+        moves = sorted(pos.gen_moves(), key=pos.value, reverse=True)
+        if entry is not None and entry.move in moves:
+            moves.remove(entry.move)
+            moves.insert(0, entry.move)
+        if not moves:
+            return None
+        hist = list(hist)
+        self.searches += 1
+        searcher = self.searcher
+        searcher.tp_score.clear()
+        searcher.history = set(hist)
+        searcher.nodes = 0
+        self.nodes = 0
+        start = time.time()
+        deadline = None
+        result = None
+        best = moves[0]
+        with metrics.span('search', workers=self.workers):
+            try:
+                for depth in count(1):
+                    searcher.deadline = deadline
+                    score = -bisect(searcher, pos.move(best), depth-1)
+                    futures = [(move, self.executor.submit(split_worker, self.searches, pos, hist, move, depth, score, deadline))
+                               for move in moves if move != best]
+                    try:
+                        for move, future in futures:
+                            better, nodes = future.result()
+                            self.nodes += nodes
+                            if better is not None and better > score:
+                                best, score = move, better
+                    finally:
+                        for _move, future in futures:
+                            future.cancel()
+                    result = (depth, best, score)
+                    #finish at least one depth, then stop exactly at the deadline
+                    deadline = start + budget
+                    if time.time() > deadline:
+                        break
+            except SearchAborted:
+                pass
+            finally:
+                searcher.deadline = None
+        self.nodes += searcher.nodes
+
+        metrics.gauge('search_depth', result[0], workers=self.workers)
+        metrics.count('search_nodes', self.nodes, workers=self.workers)
+        if self.cache is not None:
+            self.cache.put(pos, result[1], result[2], result[0])
+        return result
+
+    def shutdown(self):
+        self.executor.shutdown()
+
+
+class Ponderer:
+
+    def __init__(self, searcher, predict_time=0.2):
+        """Searches on the robot's behalf while the human is thinking.
+
+        When the human is to move, the ponderer guesses the human's move (the best reply the last search found)
+        and searches the robot's answer to it in a background thread. If the human plays that move,
+        the result is used right away; otherwise the search starts over, with the best moves found so far already known.
+
+        searcher -- the InterruptibleSearcher that is also used for the robot's own searches
+        predict_time -- how long to search for the human's move if the last search didn't find one
+        """
+        self.searcher = searcher
+        self.predict_time = predict_time
+        self.thread = None
+        self.expected = None
+        self.result = None
+        self.started = None
+
+    def start(self, pos, hist):
+        """Starts pondering in position pos, where the human is to move."""
+        self.expected = None
+        self.result = None
+        self.started = time.time()
+        self.searcher.abort.clear()
+        self.thread = threading.Thread(target=self.run, args=(pos, list(hist)), daemon=True)
+        self.thread.start()
+
+    def run(self, pos, hist):
+        try:
+            predicted = self.searcher.tp_move.get(pos)
+            if predicted is None:
+                result = think(self.searcher, pos, hist, self.predict_time)
+                predicted = result[1] if result is not None else None
+            if predicted is None:
+                return
+            expected = pos.move(predicted)
+            self.expected = expected
+            self.started = time.time()
+            for depth, move, score in self.searcher.search(expected, hist + [expected]):
+                self.result = (depth, move, score)
+        except SearchAborted:
+            pass
+
+    def stop(self, pos):
+        """Stops pondering, pos is the position after the human's actual move.
+        Returns (result, seconds pondered) if the human played the expected move, otherwise None."""
+        if self.thread is None:
+            return None
+        self.searcher.abort.set()
+        self.thread.join()
+        self.searcher.abort.clear()
+        self.thread = None
+        if self.expected is not None and pos == self.expected:
+            return self.result, time.time() - self.started
+        return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compares the depth and speed of the search on different numbers of cores.')
+    parser.add_argument('--budget', type=float, default=1, help='search time per position in seconds')
+    parser.add_argument('--cores', type=int, nargs='+', default=[1, 2, 4, os.cpu_count()], help='core counts to compare')
+    parser.add_argument('--moves', default='e2e4 e7e5 g1f3 b8c6 f1c4 g8f6', help='opening moves, every position along them is searched')
+    args = parser.parse_args()
+
+    hist = [Position(initial, 0, (True,True), (True,True), 0, 0)]
+    for ply, smove in enumerate(args.moves.split()):
+        move = parse(smove[:2]), parse(smove[2:4])
+        if ply % 2:
+            move = 119-move[0], 119-move[1]
+        hist.append(hist[-1].move(move))
+
+    print('%5s %8s %12s %10s' % ('cores', 'depth', 'nodes/s', 'positions'))
+    for cores in sorted(set(args.cores)):
+        depths, nodes, elapsed = [], 0, 0
+        if cores == 1:
+            searcher = InterruptibleSearcher()
+        else:
+            parallel = ParallelSearcher(cores)
+            #start the worker processes before measuring
+            parallel.search(hist[0], hist[:1], 0.05)
+        for i in range(len(hist)):
+            start = time.time()
+            if cores == 1:
+                result = think(searcher, hist[i], hist[:i+1], args.budget)
+                nodes += searcher.nodes
+            else:
+                result = parallel.search(hist[i], hist[:i+1], args.budget)
+                nodes += parallel.nodes
+            elapsed += time.time() - start
+            depths.append(result[0] if result is not None else 0)
+        if cores > 1:
+            parallel.shutdown()
+        print('%5d %8.1f %12.0f %10d' % (cores, sum(depths)/len(depths), nodes/elapsed, len(depths)))
@@ -0,0 +1,74 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+from sunfish import Position, initial, parse
+
+import pgn
+from moveDetection import MoveDetector
+
+
+'''
+Extracts the game of one recorded video and writes it as PGN next to outDir/<video name>.pgn
+Every move carries the position in the video (in seconds) where the movement stopped as comment.
+The video has to start with the board in the starting position and shows the moves of both players.
+Frames are streamed from disk and none are dropped, the video is read as fast as it can be analyzed.
+Returns (path, number of moves, number of frames read, seconds)
+'''
+def extract(path, outDir, stride=1):
+    #every worker process analyzes one video, more threads per process only compete for the cores
+    cv2.setNumThreads(1)
+    start = time.time()
+    md = MoveDetector(path, stride=stride, drop=False)
+    pos = Position(initial, 0, (True,True), (True,True), 0, 0)
+    moves = []
+    result = '*'
+    try:
+        while True:
+            white = len(moves) % 2 == 0
+            if not pgn.legal_moves(pos):
+                #checkmate or stalemate
+                mate = moves and moves[-1][0].endswith('#')
+                result = ('0-1' if white else '1-0') if mate else '1/2-1/2'
+                break
+            name = md.getMove(pos, flipped=not white)
+            if name is None:
+                break
+            move = parse(name[:2]), parse(name[2:4])
+            if not white:
+                move = 119-move[0], 119-move[1]
+            moves.append((pgn.san(pos, move, white), '%.2fs' % md.stillness.lastMotion))
+            pos = pos.move(move)
+    finally:
+        md.close()
+
+    name = os.path.splitext(os.path.basename(path))[0]
+    pgn.write(os.path.join(outDir, name + '.pgn'), moves, {'Site': os.path.basename(path)}, result)
+    return path, len(moves), md.seq, time.time() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Extracts the games of recorded videos as PGN, one video per worker process.')
+    parser.add_argument('videos', nargs='+', help='video files, each showing one game from the starting position')
+    parser.add_argument('--out', default='.', help='directory for the PGN files')
+    parser.add_argument('--workers', type=int, help='number of worker processes (default: number of cores)')
+    parser.add_argument('--stride', type=int, default=1, help='analyze only every stride-th frame')
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    start = time.time()
+    frames = 0
+    with ProcessPoolExecutor(args.workers) as executor:
+        futures = {executor.submit(extract, video, args.out, args.stride): video for video in args.videos}
+        for future in as_completed(futures):
+            try:
+                path, moves, n, seconds = future.result()
+            except Exception as e:
+                print('%s failed: %r' % (futures[future], e))
+                continue
+            frames += n
+            print('%s: %d moves, %d frames in %.1f s (%.1f fps)' % (path, moves, n, seconds, n/max(seconds, 1e-9)))
+    elapsed = time.time() - start
+    print('%d videos, %d frames in %.1f s: %.1f fps overall' % (len(args.videos), frames, elapsed, frames/max(elapsed, 1e-9)))
@@ -0,0 +1,206 @@
+import os
+import threading
+import time
+from collections import deque, namedtuple
+
+import cv2
+
+from mjpegStream import MjpegStream
+
+
+Frame = namedtuple('Frame', 'seq timestamp image')
+
+
+class FrameGrabber:
+
+    '''
+    Reads a video stream on a background thread for as long as it lives.
+    Frames are resized to the given width and kept in a bounded ring buffer together with
+    a sequence number and the time they were read (the position in the video for files).
+    If the consumer is too slow, the oldest frames are dropped, so the analysis always works on fresh frames.
+    Needs the url of the stream (or a video file, or any object with a cv2.VideoCapture-like read())
+    MJPEG streams over HTTP are read by MjpegStream: the buffer then holds the encoded frames,
+    and only the frames handed out by next() and latest() are decoded (at reduced scale).
+    Sources with grab() and decode() like MjpegStream are buffered the same way
+    '''
+    def __init__(self, source, width=320, bufferSize=4, drop=True, reconnectDelay=1.0):
+        self.source = source
+        self.width = width
+        self.drop = drop
+        self.reconnectDelay = reconnectDelay
+        self.frames = deque(maxlen=bufferSize)
+        self.condition = threading.Condition()
+        self.seq = 0
+        self.resize = None
+        self.height = None
+        self.decoder = None
+        self.ended = False
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        with self.condition:
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join()
+
+    '''
+    Opens the source, returns a capture object
+    HTTP urls are read as MJPEG if they serve a multipart stream, everything else goes through cv2.VideoCapture
+    '''
+    def open(self):
+        if isinstance(self.source, str):
+            if self.source.startswith(('http://', 'https://')):
+                try:
+                    return MjpegStream(self.source, self.width)
+                except (OSError, ValueError) as e:
+                    print('Reading %s with cv2: %s' % (self.source, e))
+            return cv2.VideoCapture(self.source)
+        return self.source
+
+    '''
+    Capture loop: reads, resizes and buffers frames until stopped
+    Live streams are reopened when they break, files end the loop
+    '''
+    def run(self):
+        live = isinstance(self.source, str) and self.source.startswith(('http://', 'https://', 'rtsp://'))
+        #files (and sources with their own clock, like recorded or synthetic frames) can be read faster than real time
+        videoFile = os.path.isfile(self.source) if isinstance(self.source, str) else hasattr(self.source, 'get')
+        cap = None
+        try:
+            cap = self.open()
+            while self.running:
+                #encoded frames are only decoded when they are handed out
+                if hasattr(cap, 'decode'):
+                    image = cap.grab()
+                    ref = image is not None
+                else:
+                    ref, image = cap.read()
+                if not ref:
+                    if not live:
+                        break
+                    cap.release()
+                    cap = None
+                    time.sleep(self.reconnectDelay)
+                    cap = self.open()
+                    continue
+                self.decoder = cap if hasattr(cap, 'decode') else None
+                self.put(image if self.decoder else self.prepare(image), cap.get(cv2.CAP_PROP_POS_MSEC)/1000 if videoFile else None)
+        finally:
+            #however the loop stopped, nobody may keep waiting for frames
+            if cap is not None and isinstance(self.source, str):
+                cap.release()
+            with self.condition:
+                self.ended = True
+                self.condition.notify_all()
+
+    '''
+    Decodes a frame that was buffered encoded, returns the frame unchanged otherwise
+    The image is None if the frame could not be decoded
+    '''
+    def load(self, frame):
+        if frame is None or self.decoder is None:
+            return frame
+        image = self.decoder.decode(frame.image)
+        return frame._replace(image=None if image is None else self.prepare(image))
+
+    '''
+    Resizes a frame so that its width is self.width px
+    All frames get the size of the first one, even if they were decoded at a different scale
+    '''
+    def prepare(self, image):
+        if self.resize is None:
+            self.resize = self.width/image.shape[1]
+            self.height = round(image.shape[0]*self.resize)
+        if image.shape[:2] == (self.height, self.width):
+            return image
+        return cv2.resize(image, (self.width, self.height))
+
+    '''
+    Adds a frame to the ring buffer, timestamp defaults to the current time
+    Without dropping, waits until the consumer made room
+    '''
+    def put(self, image, timestamp=None):
+        with self.condition:
+            if not self.drop:
+                while self.running and len(self.frames) == self.frames.maxlen:
+                    self.condition.wait()
+            self.seq += 1
+            self.frames.append(Frame(self.seq, time.time() if timestamp is None else timestamp, image))
+            self.condition.notify_all()
+
+    '''
+    Returns the oldest buffered frame that is newer than the frame with sequence number after
+    Waits for such a frame; returns None if the stream ended or the timeout passed
+    Frames that can't be decoded are skipped
+    '''
+    def next(self, after=0, timeout=None):
+        while True:
+            frame = self.load(self.find(after, timeout))
+            if frame is None or frame.image is not None:
+                return frame
+            after = frame.seq
+
+    '''
+    Returns the newest frame that is newer than after, skipping everything in between
+    '''
+    def latest(self, after=0, timeout=None):
+        frame = self.find(after, timeout)
+        if frame is None:
+            return None
+        with self.condition:
+            if self.frames and self.frames[-1].seq > frame.seq:
+                frame = self.frames[-1]
+        decoded = self.load(frame)
+        return decoded if decoded.image is not None else self.next(frame.seq, timeout)
+
+    '''
+    Returns the newest frame that is newer than after without consuming it, for observers like the spectator stream
+    Waits for such a frame; returns None if the stream ended or the timeout passed
+    '''
+    def peek(self, after=0, timeout=None):
+        with self.condition:
+            deadline = None if timeout is None else time.time() + timeout
+            while not (self.frames and self.frames[-1].seq > after):
+                if self.ended or not self.running:
+                    return None
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self.condition.wait(remaining)
+            frame = self.frames[-1]
+        return self.load(frame)
+
+    '''
+    Same as next, but without decoding
+    '''
+    def find(self, after=0, timeout=None):
+        with self.condition:
+            deadline = None if timeout is None else time.time() + timeout
+            while True:
+                if not self.drop and self.frames and self.frames[0].seq <= after:
+                    #skipped frames are consumed too, otherwise a full buffer of them would block the producer
+                    while self.frames and self.frames[0].seq <= after:
+                        self.frames.popleft()
+                    self.condition.notify_all()
+                for frame in self.frames:
+                    if frame.seq > after:
+                        if not self.drop:
+                            #frames up to this one are consumed, make room for the producer
+                            while self.frames and self.frames[0].seq <= frame.seq:
+                                self.frames.popleft()
+                            self.condition.notify_all()
+                        return frame
+                if self.ended or not self.running:
+                    return None
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self.condition.wait(remaining)
@@ -0,0 +1,65 @@
+from collections import namedtuple
+from functools import lru_cache
+
+
+Program = namedtuple('Program', 'gcode estimate legacy delay')
+
+#squares of a sunfish board (from the perspective of the side to move)
+A1, H1 = 91, 98
+
+
+class GcodeCompiler:
+
+    def __init__(self, octoprint):
+        """Compiles a sunfish move into one complete g-code program for the robot's turn.
+
+        The program removes captured pieces (also en passant), moves the piece, moves the rook when castling
+        and parks once at the end. It is sent as a whole (as a job in 'poll' mode), so the printer runs it
+        without any round trips to the host in between. Programs are memoized by their steps, i.e. by
+        (from, to, piece class, capture), so every square pair is only planned once.
+
+        octoprint -- the Octoprint object whose planner and delays are used
+        """
+        self.o = octoprint
+        self.compile = lru_cache(maxsize=None)(self.compile)
+
+    def field(self, square):
+        """Returns the x/y coordinates (1-8) of a square of a board from the robot's perspective.
+        The robot plays black, so its boards are rotated against the coordinates of the printer."""
+        rank, fil = divmod((119 - square) - A1, 10)
+        return fil + 1, -rank + 1
+
+    def steps(self, pos, move):
+        """Returns the steps (see MotionPlanner) the gripper has to perform for a move of the robot in pos."""
+        i, j = move
+        piece = pos.board[i]
+        xf, yf = self.field(i)
+        xt, yt = self.field(j)
+        steps = []
+        if pos.board[j] != '.':
+            steps.append(('remove', xt, yt, pos.board[j] == 'p'))
+        elif piece == 'P' and j == pos.ep:
+            #en passant: the captured pawn is behind the target square
+            steps.append(('remove',) + self.field(j+10) + (True,))
+        steps.append(('move', xf, yf, xt, yt, piece == 'P'))
+        if piece == 'K' and abs(j-i) == 2:
+            #castling: the rook jumps over the king
+            rook = A1 if j < i else H1
+            steps.append(('move',) + self.field(rook) + self.field((i+j)//2) + (False,))
+        return tuple(steps)
+
+    def promotes(self, pos, move):
+        """Returns whether the move promotes a pawn (sunfish always promotes to a queen)."""
+        return pos.board[move[0]] == 'P' and 21 <= move[1] <= 28
+
+    def compile(self, steps):
+        """Returns the Program for a tuple of steps."""
+        path = self.o.planner.plan(steps)
+        #the fixed delays the separate remove/from_to calls would have waited
+        delay = sum(self.o.sleep_remove if step[0] == 'remove' else self.o.sleep_park + self.o.sleep_move for step in steps)
+        return Program(self.o.planner.gcode(path), self.o.planner.duration(path),
+                       self.o.planner.duration(self.o.planner.legacy(steps)), delay)
+
+    def program(self, pos, move):
+        """Returns the Program for a move of the robot in pos."""
+        return self.compile(self.steps(pos, move))
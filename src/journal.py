@@ -0,0 +1,91 @@
+import json
+import os
+import threading
+import time
+from sunfish import Position, initial, parse
+
+
+class Journal:
+
+    def __init__(self, path):
+        """An append-only log of the current game that survives crashes, see restore for reading it back.
+
+        Every event is one JSON line that is flushed to disk before record returns, so a crash can at most
+        lose the line that was being written; a broken last line is ignored when loading.
+        Events are {'event': 'game', ...} when a game starts, {'event': 'move', 'side': 'human'|'robot', 'move': 'e2e4'}
+        for every move (in white's coordinates), {'event': 'motion', 'gantry': [x, y, z]} when the printer finished
+        the robot's last move, and {'event': 'end', 'result': ...} when the game is over.
+
+        path -- the file of the journal; it only ever holds one game
+        """
+        self.path = path
+        self.file = None
+        self.lock = threading.Lock()
+
+    def start(self, **info):
+        """Starts the journal of a new game, replacing the one of the last game."""
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+            self.file = open(self.path, 'w')
+        self.record('game', time=time.time(), **info)
+
+    def resume(self):
+        """Continues the journal of the last game."""
+        with self.lock:
+            if self.file is None:
+                self.file = open(self.path, 'a')
+
+    def record(self, event, **data):
+        """Appends an event and makes sure it is on disk. Can be called from any thread."""
+        line = json.dumps(dict(data, event=event)) + '\n'
+        with self.lock:
+            if self.file is None:
+                return
+            self.file.write(line)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def load(self):
+        """Returns the events of the last game, or an empty list if there is none."""
+        if not os.path.exists(self.path):
+            return []
+        events = []
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    #the line that was being written when the program stopped
+                    break
+        return events
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+def restore(events):
+    """Replays the events of a journal. Returns None if there is no unfinished game, otherwise a dict with
+    'hist' (the sunfish positions, like in main.play), 'info' (what was recorded when the game started),
+    'moving' (whether the printer may not have finished the robot's last move) and
+    'gantry' (the last known position of the print head as [x, y, z], or None)."""
+    if not events or events[0].get('event') != 'game' or any(e.get('event') == 'end' for e in events):
+        return None
+    hist = [Position(initial, 0, (True,True), (True,True), 0, 0)]
+    moving = False
+    gantry = None
+    for e in events:
+        if e['event'] == 'move':
+            move = parse(e['move'][:2]), parse(e['move'][2:4])
+            if e['side'] == 'robot':
+                #the robot plays black, its board is rotated
+                move = 119-move[0], 119-move[1]
+                moving = True
+            hist.append(hist[-1].move(move))
+        elif e['event'] == 'motion':
+            moving = False
+            gantry = e.get('gantry')
+    return {'hist': hist, 'info': events[0], 'moving': moving, 'gantry': gantry}
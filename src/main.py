@@ -1,92 +1,222 @@
-from sunfish import Position, initial, Searcher, print_pos, MATE_LOWER, MATE_UPPER, parse, render
+from sunfish import Position, initial, print_pos, MATE_LOWER, MATE_UPPER, parse, render
+import argparse
 import re
 import time
 from octoprint import Octoprint
-import secrets
+from motionQueue import MotionQueue
 from moveDetection import MoveDetector
-
-
-def parse_move(move):
-    xf = ord(move[0]) - ord('a') + 1
-    yf = int(move[1])
-    xt = ord(move[2]) - ord('a') + 1
-    yt = int(move[3])
-    return xf, yf, xt, yt
-
-def is_pawn(x, y, hist, last_move=False):
-    h = hist[-2].rotate() if last_move else hist[-1]
-    p = h[0][100 - y*10 + x]
-    return p == 'p' or p == 'P'
-
-def new_field_is_empty(x,y,hist):
-    f = hist[-2].rotate()[0][100 - y*10 + x]
-    return f == '.'
-    
-
-def main():
-
-    md = MoveDetector('http://192.168.178.39/webcam/?action=stream')
-    o = Octoprint(api_key=secrets.api_key)
-
-    print('Welcome to 3d printer chess.')
-    s = None
-    while s != 'n' and s != 'y':
-        s = input('Should we home the 3d printer? (y/n)\n')
-    if s == 'y':
-        o.home()
-
-    print('Homing finished. Parking.')
-    o.park()
-
-    hist = [Position(initial, 0, (True,True), (True,True), 0, 0)]
-    searcher = Searcher()
-
-    print('Game started')
+from engine import InterruptibleSearcher, ParallelSearcher, Ponderer, think
+from positionCache import PositionCache
+from journal import Journal, restore
+from spectatorStream import SpectatorStream
+import metrics
+import calibration
+
+
+def play(md, q, cache=None, budget=1, robot_moves=None, on_human_turn=None, search=None, hist=None, journal=None):
+    """Plays a game against the human until someone wins or the stream ends.
+    Returns the timings of every turn as a list of dicts with the keys
+    'wait' (the whole getMove call), 'detection' (from the end of the movement to the recognized move),
+    'search' and 'motion' (from queuing the robot's turn until the printer parked), all in seconds.
+
+    md -- the MoveDetector
+    q -- the MotionQueue of the printer
+    cache -- a PositionCache for search results and book moves
+    budget -- how long to search in seconds
+    robot_moves -- optional iterator of moves like 'e7e5' that the robot plays instead of the searched ones (to replay a recorded game)
+    on_human_turn -- optional function that is called right before waiting for the human's move
+    search -- optional function search(pos, hist, budget) -> (depth, move, score) that replaces the
+              in-process search (e.g. a shared engine pool); there is no pondering then
+    hist -- the positions of a game to continue (see journal.restore), by default a new game starts
+    journal -- a Journal that records every move, so that the game can be continued after a crash
+    """
+    hist = list(hist) if hist else [Position(initial, 0, (True,True), (True,True), 0, 0)]
+    record = journal.record if journal is not None else lambda *args, **kwargs: None
+    searcher = InterruptibleSearcher()
+    #searches the expected reply while the human is thinking
+    ponderer = Ponderer(searcher) if search is None else None
+    timings = []
+
+    #a resumed game may have stopped before the robot's move
+    robot_first = len(hist) % 2 == 0
+    print('Game started' if len(hist) == 1 else 'Game resumed')
     while True:
-        print_pos(hist[-1])
-
-        if hist[-1].score <= -MATE_LOWER:
-            print('You lost')
-            break
+        timing = {}
+        pondered = None
+        if not robot_first:
+            print_pos(hist[-1])
+
+            if hist[-1].score <= -MATE_LOWER:
+                print('You lost')
+                record('end', result='0-1')
+                break
     
-        print('Your move:\a')
-        move = None
-        while move not in hist[-1].gen_moves():
-            match = re.match('([a-h][1-8])'*2, md.getMove())
-            if match:
-                move = parse(match.group(1)), parse(match.group(2))
-            else:
-                print('Please enter a move like g8f6')
-        hist.append(hist[-1].move(move))
+            q.wait()
+            if on_human_turn is not None:
+                on_human_turn()
+            print('Your move:\a')
+            start = time.time()
+            move = None
+            while move not in hist[-1].gen_moves():
+                smove = md.getMove(hist[-1])
+                if smove is None:
+                    break
+                match = re.match('([a-h][1-8])'*2, smove)
+                if match:
+                    move = parse(match.group(1)), parse(match.group(2))
+                else:
+                    print('Please enter a move like g8f6')
+            if move not in hist[-1].gen_moves():
+                print('The stream ended')
+                break
+            timing['wait'] = time.time() - start
+            timing['detection'] = time.time() - md.stillness.lastMotion
+            hist.append(hist[-1].move(move))
+            record('move', side='human', move=render(move[0]) + render(move[1]))
+            pondered = ponderer.stop(hist[-1]) if ponderer is not None else None
 
-        print_pos(hist[-1].rotate())
+            print_pos(hist[-1].rotate())
 
-        if hist[-1].score <= -MATE_LOWER:
-            print('You won')
-            break
+            if hist[-1].score <= -MATE_LOWER:
+                print('You won')
+                record('end', result='1-0')
+                break
+
+        robot_first = False
 
         start = time.time()
-        for _depth, move, score in searcher.search(hist[-1], hist):
-            if time.time() - start > 1:
-                break
+        if search is None:
+            result = think(searcher, hist[-1], hist, budget, pondered, cache)
+        else:
+            result = search(hist[-1], hist, budget)
+        timing['search'] = time.time() - start
+        if result is None or result[1] is None:
+            #e.g. stalemate, sunfish doesn't tell
+            print('I have no move left')
+            record('end', result='*')
+            break
+        _depth, move, score = result
 
         if score == MATE_UPPER:
             print('Checkmate!')
+
+        if robot_moves is not None:
+            recorded = next(robot_moves, None)
+            if recorded is None:
+                break
+            move = 119-parse(recorded[:2]), 119-parse(recorded[2:4])
     
         smove = render(119-move[0]) + render(119-move[1])
         print('My move:', smove)
+        #recorded before the printer starts, a crash during the motion leaves the board in between
+        record('move', side='robot', move=smove)
+        start = time.time()
+        future = q.move(hist[-1], move)
         hist.append(hist[-1].move(move))
+        #written while the printer moves, not before the move starts
+        if cache is not None:
+            cache.save()
 
         #print(hist[-1][0])
 
-        xf,yf,xt,yt = parse_move(smove)
-        capturing = not new_field_is_empty(xt, yt, hist)
-        if capturing:
-            pawn = is_pawn(xt,yt, hist, last_move=True)
-            #print('Capturing pawn:', pawn)
-            o.remove(xt,yt,pawn)
-        pawn = is_pawn(xt,yt, hist)
-        o.from_to(xf,yf,xt,yt, pawn=pawn)
+        future.add_done_callback(lambda f, timing=timing, start=start: timing.__setitem__('motion', time.time() - start))
+        def parked(f):
+            #the printer parks after every move
+            if f.exception() is None:
+                record('motion', gantry=list(q.o.park_xy) + [q.o.z_park])
+        future.add_done_callback(parked)
+        timings.append(timing)
+        if ponderer is not None:
+            ponderer.start(hist[-1], hist)
+
+    if ponderer is not None:
+        ponderer.stop(None)
+    q.wait()
+    return timings
+
+
+def main():
+    import secrets
+
+    parser = argparse.ArgumentParser(description='Play chess against your 3d printer.')
+    parser.add_argument('--stream', default='http://192.168.178.39/webcam/?action=stream', help='URL of the webcam stream')
+    parser.add_argument('--host', default='http://192.168.178.39', help='URL of your Octoprint instance')
+    parser.add_argument('--home', choices=('y', 'n'), help='whether to home the 3d printer (asks if not given)')
+    parser.add_argument('--cache', default='positions.bin', help='file with the search results and opening book of earlier games')
+    parser.add_argument('--calibration', default='calibration.json', help='file with the board position, noise level and printer offsets of earlier runs')
+    parser.add_argument('--journal', default='game.journal', help='file that records the current game, see --resume')
+    parser.add_argument('--resume', action='store_true', help='continue the game of the journal, e.g. after a crash')
+    parser.add_argument('--workers', type=int, default=1, help='search on this many cores (no pondering then)')
+    parser.add_argument('--trace', help='record timings and counters to this JSON-lines file (toggle with SIGUSR1)')
+    parser.add_argument('--metrics-port', type=int, help='serve the recorded values for Prometheus on this port')
+    parser.add_argument('--spectator-port', type=int, help='serve the camera stream with overlays to spectators on this port')
+    args = parser.parse_args()
+
+    if args.trace:
+        metrics.enable(args.trace)
+    if args.metrics_port:
+        metrics.enable()
+        metrics.serve(args.metrics_port)
+    metrics.install_signal()
+
+    journal = Journal(args.journal)
+    state = restore(journal.load()) if args.resume else None
+    if args.resume and state is None:
+        print('There is no game to resume, starting a new one.')
+    if state is not None and calibration.load(args.calibration) is None and state['info'].get('calibration'):
+        #the journal keeps a copy of the calibration the game started with
+        for section, values in state['info']['calibration'].items():
+            calibration.save(args.calibration, section, values)
+
+    md = MoveDetector(args.stream, calibration=args.calibration)
+    #spectators share the detector's capture instead of opening their own
+    spectators = SpectatorStream(md, args.spectator_port).start() if args.spectator_port else None
+    if spectators is not None:
+        print('Spectators can watch at %s/stream' % spectators.url)
+    #the printer offsets can be adjusted in the calibration file
+    printer = calibration.load(args.calibration, 'printer')
+    offsets = {'a1': tuple(printer['a1']), 'field_size': printer['field_size']} if printer else {}
+    o = Octoprint(host=args.host, api_key=secrets.api_key, wait='poll', **offsets)
+    if printer is None:
+        calibration.save(args.calibration, 'printer', {'a1': list(o.a1), 'field_size': o.field_size})
+    #motions run in the background, we only wait for them when the camera needs a clear view
+    q = MotionQueue(o)
+
+    print('Welcome to 3d printer chess.')
+    s = args.home
+    if state is not None and s is None and o.still_homed():
+        print('The printer is still homed.')
+        s = 'n'
+    while s != 'n' and s != 'y':
+        s = input('Should we home the 3d printer? (y/n)\n')
+    if s == 'y':
+        q.home()
+
+    if state is not None and state['moving']:
+        input('The printer may not have finished its last move. Please put the pieces where they belong and press enter.\n')
+    if state is None or state['moving'] or state['gantry'] != list(o.park_xy) + [o.z_park] or s == 'y':
+        print('Parking.')
+        q.park()
+
+    if state is not None:
+        journal.resume()
+    else:
+        journal.start(calibration=calibration.load(args.calibration))
+
+    #search results (and the opening book) of earlier games
+    cache = PositionCache(args.cache)
+    if args.workers > 1:
+        parallel = ParallelSearcher(args.workers, cache)
+        play(md, q, cache, search=parallel.search, hist=state and state['hist'], journal=journal)
+        parallel.shutdown()
+    else:
+        play(md, q, cache, hist=state and state['hist'], journal=journal)
+    cache.save()
+    q.shutdown()
+    if spectators is not None:
+        spectators.stop()
+    md.close()
+    journal.close()
 
 
 if __name__ == '__main__':
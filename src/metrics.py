@@ -0,0 +1,172 @@
+"""Low-overhead timers, counters and gauges for profiling real sessions.
+
+Everything is a no-op until enable() is called, and can be switched on and off at runtime
+(also with SIGUSR1, see install_signal). While enabled, every event is appended to a JSON-lines
+trace file (if one is given) and aggregated for a Prometheus-style text endpoint (see serve).
+
+    with metrics.span('search'):
+        ...
+    metrics.count('frames_analyzed')
+    metrics.gauge('search_depth', depth)
+"""
+import json
+import signal
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+enabled = False
+_lock = threading.Lock()
+_trace = None
+_tracePath = None
+_counters = defaultdict(float)
+_gauges = {}
+_timers = defaultdict(lambda: [0, 0.0])
+
+
+def enable(trace_path=None):
+    """Starts recording; events are appended to trace_path as JSON lines if it is given."""
+    global enabled, _trace, _tracePath
+    with _lock:
+        if trace_path is not None:
+            _tracePath = trace_path
+        if _tracePath is not None and _trace is None:
+            _trace = open(_tracePath, 'a', buffering=1)
+        enabled = True
+
+
+def disable():
+    """Stops recording and closes the trace file. The aggregated values are kept."""
+    global enabled, _trace
+    with _lock:
+        enabled = False
+        if _trace is not None:
+            _trace.close()
+            _trace = None
+
+
+def toggle(*args):
+    """Switches recording on or off. Safe in a signal handler: it only flips the switch and never takes the lock,
+    which the interrupted thread may hold. The trace file stays open and is reopened by the next event if needed."""
+    global enabled
+    enabled = not enabled
+
+
+def install_signal():
+    """Toggles recording whenever the process receives SIGUSR1 (not available on Windows)."""
+    if hasattr(signal, 'SIGUSR1'):
+        signal.signal(signal.SIGUSR1, toggle)
+
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items())))
+
+
+def _write(event):
+    #called with the lock held
+    global _trace
+    if _trace is None and _tracePath is not None:
+        #recording was switched on by toggle
+        _trace = open(_tracePath, 'a', buffering=1)
+    if _trace is not None:
+        _trace.write(json.dumps(event) + '\n')
+
+
+def count(name, value=1, **labels):
+    """Adds value to a counter."""
+    if not enabled:
+        return
+    with _lock:
+        _counters[_key(name, labels)] += value
+        _write({'ts': time.time(), 'type': 'count', 'name': name, 'value': value, **labels})
+
+
+def gauge(name, value, **labels):
+    """Sets a gauge to value."""
+    if not enabled:
+        return
+    with _lock:
+        _gauges[_key(name, labels)] = value
+        _write({'ts': time.time(), 'type': 'gauge', 'name': name, 'value': value, **labels})
+
+
+def observe(name, seconds, **labels):
+    """Records the duration of something that took the given seconds."""
+    if not enabled:
+        return
+    with _lock:
+        timer = _timers[_key(name, labels)]
+        timer[0] += 1
+        timer[1] += seconds
+        _write({'ts': time.time(), 'type': 'span', 'name': name, 'duration': seconds, **labels})
+
+
+class span:
+
+    """Context manager that records how long its block took (see observe)."""
+    __slots__ = ('name', 'labels', 'start')
+
+    def __init__(self, name, **labels):
+        self.name = name
+        self.labels = labels
+        self.start = None
+
+    def __enter__(self):
+        if enabled:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.start is not None:
+            observe(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+def _series(name, labels, suffix=''):
+    text = ','.join('%s="%s"' % (k, str(v).replace('"', '\\"')) for k, v in labels)
+    return 'chess_%s%s%s' % (name, suffix, '{%s}' % text if text else '')
+
+
+def prometheus():
+    """Returns all aggregated values in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        for (name, labels), value in sorted(_counters.items()):
+            lines.append('%s %s' % (_series(name, labels, '_total'), value))
+        for (name, labels), value in sorted(_gauges.items()):
+            lines.append('%s %s' % (_series(name, labels), value))
+        for (name, labels), (n, total) in sorted(_timers.items()):
+            lines.append('%s %d' % (_series(name, labels, '_seconds_count'), n))
+            lines.append('%s %s' % (_series(name, labels, '_seconds_sum'), total))
+    return '\n'.join(lines) + '\n'
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        path = self.path.split('?')[0]
+        if path == '/metrics':
+            status, body = 200, prometheus()
+        elif path in ('/enable', '/disable'):
+            enable() if path == '/enable' else disable()
+            status, body = 200, 'enabled\n' if enabled else 'disabled\n'
+        else:
+            status, body = 404, 'not found\n'
+        data = body.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(port=9100, host='127.0.0.1'):
+    """Serves /metrics (and /enable, /disable to switch recording) on a background thread."""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
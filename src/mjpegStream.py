@@ -0,0 +1,97 @@
+import numpy as np
+import cv2
+import requests
+import urllib3
+
+
+#decoding flags that let libjpeg scale the image down while decoding (only the needed DCT coefficients are used)
+REDUCED = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+
+class MjpegStream:
+
+    '''
+    Reads a multipart MJPEG HTTP stream (like mjpg-streamer's ?action=stream) without decoding it.
+    grab() returns the encoded JPEG of the next frame, decode() turns it into an image that is
+    decoded at the largest reduced scale (1/2, 1/4, 1/8) that is still at least width px wide.
+    This way frames that are never looked at are never decoded, and the others cost a fraction of a full decode.
+    Needs the url of the stream; raises ValueError if the url doesn't serve a multipart stream
+    '''
+    def __init__(self, url, width=320, timeout=(3.05, 10)):
+        self.url = url
+        self.width = width
+        self.response = requests.get(url, stream=True, timeout=timeout)
+        self.response.raise_for_status()
+        contentType = self.response.headers.get('Content-Type', '')
+        if not contentType.startswith('multipart/'):
+            self.release()
+            raise ValueError('%s is not a multipart stream: %s' % (url, contentType))
+        boundary = contentType.partition('boundary=')[2].split(';')[0].strip().strip('"')
+        self.boundary = b'--' + boundary.lstrip('-').encode()
+        self.fp = self.response.raw
+        self.atPart = False
+        self.flags = None
+
+    '''
+    Returns the encoded JPEG of the next frame, or None if the stream broke
+    A stalled or truncated stream raises urllib3's own errors (e.g. ReadTimeoutError) while reading
+    '''
+    def grab(self):
+        try:
+            return self.readPart()
+        except (OSError, ValueError, requests.RequestException, urllib3.exceptions.HTTPError):
+            return None
+
+    def readPart(self):
+        #find the boundary in front of the next part
+        while not self.atPart:
+            line = self.fp.readline()
+            if not line:
+                return None
+            self.atPart = line.startswith(self.boundary)
+
+        #part headers end with an empty line
+        length = None
+        while True:
+            line = self.fp.readline()
+            if not line:
+                return None
+            line = line.strip()
+            if not line:
+                break
+            key, _, value = line.partition(b':')
+            if key.strip().lower() == b'content-length':
+                length = int(value)
+
+        self.atPart = False
+        if length is not None:
+            data = self.fp.read(length)
+            return data if len(data) == length else None
+
+        #without a length the part ends at the next boundary
+        data = bytearray()
+        while True:
+            line = self.fp.readline()
+            if not line:
+                return None
+            if line.startswith(self.boundary):
+                self.atPart = True
+                return bytes(data).rstrip(b'\r\n')
+            data += line
+
+    '''
+    Decodes an encoded JPEG, reduced while decoding if the image is large enough
+    The scale is chosen once, from the first frame
+    '''
+    def decode(self, data):
+        buffer = np.frombuffer(data, np.uint8)
+        if self.flags is None:
+            image = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+            if image is None:
+                return None
+            self.flags = next((flags for (factor, flags) in REDUCED if image.shape[1]//factor >= self.width), cv2.IMREAD_COLOR)
+            return image
+        return cv2.imdecode(buffer, self.flags)
+
+    def release(self):
+        self.response.close()
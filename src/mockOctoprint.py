@@ -0,0 +1,213 @@
+import email
+import json
+import math
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockOctoprint:
+
+    '''
+    A minimal local stand-in for the Octoprint REST API.
+    Counts connections and round trips and records every g-code line it receives,
+    so the traffic of the Octoprint client can be measured without a printer.
+
+    latency -- seconds every request takes
+    job_time -- seconds every job takes; if None, the motion of the job's g-code is simulated
+    time_scale -- factor applied to simulated motion times, e.g. 0.1 to replay ten times as fast
+    '''
+    def __init__(self, port=0, latency=0.0, job_time=0.0, time_scale=1.0, home_time=20,
+                 max_speed=(30000, 30000, 1200, 1500)):
+        self.latency = latency
+        self.job_time = job_time
+        self.time_scale = time_scale
+        self.home_time = home_time
+        self.max_speed = max_speed
+        self.position = [0.0, 0.0, 0.0]
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.round_trips = 0
+        self.commands = []
+        self.job = None
+
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            #HTTP/1.1 keeps the connection alive between requests
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                with mock.lock:
+                    mock.connections += 1
+
+            def do_GET(self):
+                mock.handle(self, 'GET')
+
+            def do_POST(self):
+                mock.handle(self, 'POST')
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self.server.daemon_threads = True
+        self.url = 'http://127.0.0.1:%d' % self.server.server_address[1]
+        self.thread = None
+
+    '''
+    Dispatches a single request and sends the response
+    '''
+    def handle(self, request, method):
+        length = int(request.headers.get('Content-Length', 0))
+        body = request.rfile.read(length) if length else b''
+        contentType = request.headers.get('Content-Type', '')
+        if contentType.startswith('multipart/form-data'):
+            payload = self.parseForm(contentType, body)
+        else:
+            payload = json.loads(body) if body else {}
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        with self.lock:
+            self.round_trips += 1
+            status, response = self.route(method, request.path, payload)
+
+        data = json.dumps(response).encode() if response is not None else b''
+        request.send_response(status)
+        request.send_header('Content-Type', 'application/json')
+        request.send_header('Content-Length', str(len(data)))
+        request.end_headers()
+        request.wfile.write(data)
+
+    '''
+    Returns status code and json response of a request, called with the lock held
+    '''
+    def route(self, method, path, payload):
+        path = path.split('?')[0]
+        if method == 'POST' and path == '/api/printer/command':
+            commands = payload.get('commands', [payload.get('command')])
+            self.commands.extend(commands)
+            return 204, None
+        if method == 'POST' and path in ('/api/printer/printhead', '/api/printer/tool'):
+            self.commands.append(payload)
+            return 204, None
+        if method == 'POST' and path == '/api/files/local':
+            if self.job is not None and time.time() < self.job['end']:
+                return 409, {'error': 'Printer is busy'}
+            name, data = payload['file']
+            commands = data.decode().splitlines()
+            self.commands.extend(commands)
+            if payload.get('print') == 'true':
+                self.job = {'name': name, 'end': time.time() + self.jobDuration(commands)}
+            return 201, {'done': True, 'files': {'local': {'name': name, 'origin': 'local'}}}
+        if method == 'GET' and path == '/api/job':
+            return 200, self.jobState()
+        if method == 'GET' and path == '/api/printer':
+            return 200, {'state': {'text': 'Operational', 'flags': {'operational': True, 'printing': False, 'ready': True}}}
+        return 404, {'error': 'Not found'}
+
+    '''
+    Returns how long the mock printer takes for a job
+    '''
+    def jobDuration(self, commands):
+        if self.job_time is not None:
+            return self.job_time
+        return self.motionTime(commands)*self.time_scale
+
+    '''
+    Simulates the g-code (G90/G91/G28/G1 with X/Y/Z/E/F) and returns how long the motion takes in seconds
+    Every axis is limited to its maximum feedrate, acceleration is ignored
+    '''
+    def motionTime(self, commands):
+        total = 0
+        absolute = True
+        feed = 6000
+        for line in commands:
+            words = dict((w[0], float(w[1:])) for w in re.findall(r'[A-Z]-?[0-9.]+', line.split(';')[0].upper()))
+            code = line.split(';')[0].split()[:1]
+            if code == ['G90']:
+                absolute = True
+            elif code == ['G91']:
+                absolute = False
+            elif code == ['G28']:
+                total += self.home_time
+                self.position = [0.0, 0.0, 0.0]
+            elif code in (['G0'], ['G1']):
+                feed = words.get('F', feed)
+                target = list(self.position)
+                for i, axis in enumerate('XYZ'):
+                    if axis in words:
+                        target[i] = words[axis] if absolute else self.position[i] + words[axis]
+                delta = [abs(target[i] - self.position[i]) for i in range(3)]
+                distance = math.sqrt(sum(d*d for d in delta))
+                times = [distance/feed] + [delta[i]/self.max_speed[i] for i in range(3)]
+                if 'E' in words:
+                    times.append(abs(words['E'])/min(feed, self.max_speed[3]))
+                total += max(times)*60
+                self.position = target
+        return total
+
+    '''
+    Returns the job information in the format of /api/job, called with the lock held
+    '''
+    def jobState(self):
+        if self.job is None:
+            return {'state': 'Operational', 'job': {'file': {'name': None}}, 'progress': {'completion': None}}
+        printing = time.time() < self.job['end']
+        return {'state': 'Printing' if printing else 'Operational',
+                'job': {'file': {'name': self.job['name']}},
+                'progress': {'completion': 50.0 if printing else 100.0}}
+
+    '''
+    Parses a multipart form into a dict, files are stored as (filename, bytes)
+    '''
+    def parseForm(self, contentType, body):
+        message = email.message_from_bytes(b'Content-Type: ' + contentType.encode() + b'\r\n\r\n' + body)
+        form = {}
+        for part in message.get_payload():
+            name = part.get_param('name', header='content-disposition')
+            data = part.get_payload(decode=True)
+            filename = part.get_filename()
+            form[name] = (filename, data) if filename else data.decode()
+        return form
+
+    def reset(self):
+        with self.lock:
+            self.connections = 0
+            self.round_trips = 0
+            self.commands = []
+            self.job = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == '__main__':
+    from octoprint import Octoprint
+
+    mock = MockOctoprint(latency=0.005, job_time=0.5).start()
+    for wait in ('sleep', 'poll'):
+        mock.reset()
+        o = Octoprint(host=mock.url, sleep=False, wait=wait, poll_interval=0.05)
+
+        start = time.time()
+        o.remove(4,4)
+        o.from_to(1,1,4,4)
+        elapsed = time.time() - start
+
+        print(wait)
+        print('  round trips:', mock.round_trips)
+        print('  connections:', mock.connections)
+        print('  g-code lines:', len(mock.commands))
+        print('  time: %.3f s' % elapsed)
+    mock.stop()
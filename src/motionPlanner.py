@@ -0,0 +1,145 @@
+import math
+
+
+class MotionPlanner:
+
+    def __init__(self, octoprint, travel_speed=6000, carry_speed=5000, z_speed=5000,
+                 max_speed=(30000, 30000, 1200, 1500)):
+        """Create a planner that turns the steps of a whole robot turn into a single toolpath.
+
+        octoprint -- the Octoprint object whose geometry (a1, field_size, heights, gripper) is used
+        travel_speed -- feedrate in mm/min of x/y moves with an empty gripper
+        carry_speed -- feedrate in mm/min of x/y moves while carrying a chess piece
+        z_speed -- feedrate in mm/min of moves along the z axis
+        max_speed -- tuple; the maximum feedrates in mm/min of the x, y, z and e axis as enforced by the firmware (used for time estimates)
+
+        A step is either ('remove', x, y, pawn) to take the piece on x/y off the board,
+        or ('move', x0, y0, x1, y1, pawn) to move a piece from x0/y0 to x1/y1.
+        A toolpath is a list of operations, either ('G1', x, y, z, speed) to move to an absolute position
+        or ('E', amount) to close (positive) or open (negative) the gripper.
+        """
+        self.o = octoprint
+        self.travel_speed = travel_speed
+        self.carry_speed = carry_speed
+        self.z_speed = z_speed
+        self.max_speed = max_speed
+
+    def field(self, x, y):
+        """Returns the x/y position in mm of the given chess field."""
+        return (self.o.a1[0] + (x-1)*self.o.field_size, self.o.a1[1] + (y-1)*self.o.field_size)
+
+    def grip(self, pawn):
+        return self.o.grab_ex + self.o.pawn_grab_ex_offset if pawn else self.o.grab_ex
+
+    def order(self, steps, start):
+        """Orders the steps so that the gripper travels as little as possible.
+        Captured pieces are always removed first, since their field has to be empty before another piece can go there."""
+        ordered = []
+        position = start[:2]
+        for kind in ('remove', 'move'):
+            pending = [step for step in steps if step[0] == kind]
+            while pending:
+                step = min(pending, key=lambda s: math.dist(position, self.field(s[1], s[2])))
+                pending.remove(step)
+                ordered.append(step)
+                position = self.field(step[3], step[4]) if kind == 'move' else self.o.drop_xy
+        return ordered
+
+    def plan(self, steps, start=None):
+        """Returns the toolpath for the given steps, starting at start (x, y, z) and parking once at the end.
+
+        All x/y travel happens at the carrying height (min_z+z_up) instead of the parking height.
+        Z and x/y moves are only combined above the carrying height, where the gripper can't hit any piece.
+        """
+        if start is None:
+            start = self.o.park_xy + (self.o.z_park,)
+        travel_z = self.o.min_z + self.o.z_up
+        path = []
+        x, y, z = start
+
+        for step in self.order(steps, start):
+            fx, fy = self.field(step[1], step[2])
+
+            #go to the piece, descending while moving if we're coming from above the carrying height
+            if z < travel_z:
+                path.append(('G1', None, None, travel_z, self.z_speed))
+            path.append(('G1', fx, fy, travel_z, self.travel_speed))
+
+            #grab it and lift it straight up
+            path.append(('G1', None, None, self.o.min_z, self.z_speed))
+            path.append(('E', self.grip(step[3] if step[0] == 'remove' else step[5])))
+            path.append(('G1', None, None, travel_z, self.z_speed))
+
+            if step[0] == 'remove':
+                #drop the piece next to the board
+                x, y = self.o.drop_xy
+                path.append(('G1', x, y, None, self.carry_speed))
+                path.append(('E', -self.grip(step[3])))
+            else:
+                #place it slightly offset and shift the open gripper back, like put_down does
+                x, y = self.field(step[3], step[4])
+                path.append(('G1', x-1, y, None, self.carry_speed))
+                path.append(('G1', None, None, self.o.min_z, self.z_speed))
+                path.append(('E', -self.grip(step[5])))
+                path.append(('G1', x, y, None, self.travel_speed))
+                path.append(('G1', None, None, travel_z, self.z_speed))
+            z = travel_z
+
+        #park once, rising while moving away from the board
+        path.append(('G1', self.o.park_xy[0], self.o.park_xy[1], self.o.z_park, self.travel_speed))
+        return path
+
+    def legacy(self, steps):
+        """Returns the toolpath the separate remove/from_to/park calls of Octoprint would take for the same steps."""
+        path = []
+        for step in steps:
+            fx, fy = self.field(step[1], step[2])
+            pawn = step[3] if step[0] == 'remove' else step[5]
+            path.append(('G1', fx, fy, None, self.o.jog_speed))
+            path.append(('G1', None, None, self.o.min_z, 5000))
+            path.append(('E', self.grip(pawn)))
+            path.append(('G1', None, None, self.o.min_z + 40, 5000))
+            if step[0] == 'remove':
+                path.append(('G1', self.o.drop_xy[0], self.o.drop_xy[1], None, self.o.jog_speed))
+                path.append(('E', -self.grip(pawn)))
+            else:
+                tx, ty = self.field(step[3], step[4])
+                path.append(('G1', tx, ty, None, self.o.jog_speed))
+                path.append(('G1', tx-1, None, None, self.o.jog_speed))
+                path.append(('G1', None, None, self.o.min_z, 5000))
+                path.append(('E', -self.grip(pawn)))
+                path.append(('G1', tx, None, None, self.o.jog_speed))
+                path.append(('G1', None, None, self.o.z_park, 5000))
+                path.append(('G1', self.o.park_xy[0], self.o.park_xy[1], None, 5000))
+        return path
+
+    def duration(self, path, start=None):
+        """Estimates how long the printer needs for a toolpath in seconds (ignoring acceleration)."""
+        if start is None:
+            start = self.o.park_xy + (self.o.z_park,)
+        position = list(start)
+        total = 0
+        for op in path:
+            if op[0] == 'E':
+                total += abs(op[1]) / min(self.o.extrude_speed, self.max_speed[3]) * 60
+                continue
+            target = [position[i] if op[i+1] is None else op[i+1] for i in range(3)]
+            delta = [abs(target[i] - position[i]) for i in range(3)]
+            distance = math.sqrt(sum(d*d for d in delta))
+            if distance:
+                #the firmware limits every axis to its maximum feedrate
+                total += max([distance / op[4]] + [delta[i] / self.max_speed[i] for i in range(3)]) * 60
+            position = target
+        return total
+
+    def gcode(self, path):
+        """Returns the g-code lines for a toolpath."""
+        lines = ['G90', 'M83']
+        for op in path:
+            if op[0] == 'E':
+                lines.append('G1 E%s F%d' % (op[1], self.o.extrude_speed))
+            else:
+                axes = ''.join(' %s%s' % (axis, value) for axis, value in zip('XYZ', op[1:4]) if value is not None)
+                lines.append('G1%s F%d' % (axes, op[4]))
+        lines.append('M82')
+        return lines
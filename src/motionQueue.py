@@ -0,0 +1,66 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class MotionQueue:
+
+    def __init__(self, octoprint):
+        """Create a queue that performs the motions of an Octoprint object in the background.
+
+        Motions run one after another on a single worker thread, in the order they were queued.
+        Every method returns a concurrent.futures.Future, so the caller can go on with other work
+        and only block (wait()) when it needs the printer to be done, e.g. before the next camera read.
+        If a motion fails, all motions queued after it fail as well instead of moving the printer.
+
+        octoprint -- the Octoprint object that sends the commands; it must not be used directly while the queue is busy
+        """
+        self.o = octoprint
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='motion')
+        self.lock = threading.Lock()
+        self.last = None
+        self.error = None
+
+    def submit(self, fn, *args, **kwargs):
+        """Queues any callable, e.g. a method of the Octoprint object, and returns its future."""
+        with self.lock:
+            self.last = self.executor.submit(self.run, fn, *args, **kwargs)
+            return self.last
+
+    def run(self, fn, *args, **kwargs):
+        if self.error is not None:
+            raise RuntimeError('An earlier motion failed') from self.error
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            self.error = e
+            raise
+
+    def home(self):
+        return self.submit(self.o.home)
+
+    def park(self):
+        return self.submit(self.o.park)
+
+    def remove(self, x, y, pawn=False):
+        return self.submit(self.o.remove, x, y, pawn)
+
+    def from_to(self, x0, y0, x1, y1, pawn=False):
+        return self.submit(self.o.from_to, x0, y0, x1, y1, pawn=pawn)
+
+    def move(self, pos, move):
+        return self.submit(self.o.play_move, pos, move)
+
+    def busy(self):
+        """Returns whether there are motions that haven't finished yet."""
+        with self.lock:
+            return self.last is not None and not self.last.done()
+
+    def wait(self, timeout=None):
+        """Blocks until all queued motions are done and raises the error of the last one, if it failed."""
+        with self.lock:
+            last = self.last
+        if last is not None:
+            last.result(timeout)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
@@ -1,7 +1,11 @@
 import numpy as np
 import cv2
-from collections import defaultdict
 import math
+from frameGrabber import FrameGrabber
+from stillnessDetection import StillnessDetector
+from boardTracker import BoardTracker
+import calibration as calibrationFile
+import metrics
 
 
 class MoveDetector:
@@ -10,38 +14,77 @@ class MoveDetector:
     Initializes the MoveDetector by estimating:
         the positions of the the squares
         the general noise level ofthe stream
+    The noise level is kept per square and updated with every still frame while waiting for a move
     Needs the url of the stream as parameter
+    The stream is read by a single long-lived FrameGrabber
+    Only every stride-th frame is analyzed while waiting for a move,
+    a move is established after the board was still for settleTime seconds
+    The expensive analysis (calibration, classification) can be run on a shared executor,
+    which limits how much of it runs at once when many boards are watched by one process
+    If a calibration file is given, the board position and noise level stored in it are reused
+    as long as a single frame confirms that the board is still there; otherwise they are detected and stored
+    Live streams drop frames the analysis can't keep up with; set drop to False to analyze every frame of a file
+    While nothing happens on the board, every trackInterval-th analyzed frame checks whether the board moved in the image
     '''
-    def __init__(self,path):
+    def __init__(self,path, stride=2, settleTime=0.3, changeThreshold=0.3, margin=0.3, executor=None, calibration=None, drop=True,
+                 trackInterval=15):
         self.path = path
-        cap = cv2.VideoCapture(self.path)
+        self.calibration = calibration
+        self.executor = executor
+        self.stride = stride
+        self.changeThreshold = changeThreshold
+        self.margin = margin
+        self.trackInterval = trackInterval
+        self.idleFrames = 0
+        self.timestamp = None
+        #the last recognized move, e.g. e2e4 (shown to spectators)
+        self.lastMove = None
 
         #input resolution is adjusted so that width is 320 px
-        self.resize = 320/cap.get(cv2.CAP_PROP_FRAME_WIDTH)
-        self.width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)*self.resize)
-        self.height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)*self.resize)
+        self.grabber = FrameGrabber(self.path, width=320, drop=drop).start()
+        self.seq = 0
+        frame = self.readFrame()
+        self.resize = self.grabber.resize
+        self.height, self.width = frame.shape[:2]
 
         self.abc= ['h', 'g', 'f', 'e', 'd','c','b','a']
+
+        #names of the squares in the rectified board, row i is rank i+1
+        self.squareNames = np.array([[self.abc[j]+str(i+1) for j in range(8)] for i in range(8)])
+        #size of a square in the rectified board and the border of it that is ignored
+        self.cellSize = 16
+        self.cellMargin = 4
         
-        self.fieldPositions = self.detectSquares()
-        self.avgNoise = self.estimateNoise()
+        stored = calibrationFile.load(calibration, 'camera')
+        if stored is not None and self.loadCalibration(stored, frame):
+            self.stillness = StillnessDetector(self.transform, self.cellSize, self.cellMargin, settleTime=settleTime)
+            if 'noise' not in stored or not self.stillness.noise.load(stored['noise']):
+                self.estimateNoise()
+        else:
+            if stored is not None:
+                print('Stored calibration does not fit the camera image, detecting the board')
+            self.fieldPositions = self.analyze(self.detectSquares)
+            self.stillness = StillnessDetector(self.transform, self.cellSize, self.cellMargin, settleTime=settleTime)
+            self.estimateNoise()
+            if calibration is not None:
+                self.saveCalibration()
+        self.tracker = BoardTracker(self.corners, frame)
 
     '''
-    Estimates the potitions of the sqaures
+    Estimates the potitions of the sqaures (in the given frame or the newest one)
     '''
-    def detectSquares(self):
-        cap = cv2.VideoCapture(self.path)
-        _, frame = cap.read()
+    def detectSquares(self, frame=None):
+        if frame is None:
+            frame = self.readFrame(latest=True)
 
         #find edges in input image
-        editedFrame = cv2.resize(frame,(0,0),fx=self.resize, fy=self.resize)
-        gray = cv2.cvtColor(editedFrame, cv2.COLOR_BGR2GRAY)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
         edges = cv2.Canny(gray, 150,200)
 
         #find vertical and horizontal lines
         #assumption: chess board is more or less aligned to the camera
-        vertLines = np.vstack((cv2.HoughLines(edges, 1, np.pi / 180, 70, None, 0, 0,0,0.05*np.pi),cv2.HoughLines(edges, 1, np.pi / 180, 70, None, 0, 0,0.95*np.pi,np.pi)))
-        horLines = cv2.HoughLines(edges, 1, np.pi / 180, 70, None, 0, 0,0.45*np.pi, 0.55*np.pi)
+        vertLines = self.houghLines(edges, (0, 0.05*np.pi), (0.95*np.pi, np.pi))
+        horLines = self.houghLines(edges, (0.45*np.pi, 0.55*np.pi))
 
         #transform polar coordinates of lines to cartesian coordinates of start and end point
         vertLines = self.getCoords(vertLines)
@@ -75,122 +118,423 @@ class MoveDetector:
                 minX = avgX
                 leftLine = line
 
+        #the lines found by the hough transform are only accurate to a pixel and a quarter degree,
+        #they are fitted to the edge pixels along them
+        ys, xs = np.nonzero(edges)
+        points = np.column_stack((xs, ys)).astype(np.float32)
+        upperLine, lowerLine, leftLine, rightLine = (self.fitLine(points, line) for line in (upperLine, lowerLine, leftLine, rightLine))
+
         #find corners of the chess board
         intersect1 = self.getIntersection(upperLine, rightLine)
         intersect2 = self.getIntersection(upperLine, leftLine)
         intersect3 = self.getIntersection(lowerLine, rightLine)
         intersect4 = self.getIntersection(lowerLine, leftLine)
 
-        #calculate positions of the squares from the corners of the chess board
+        #cache the perspective transform of the board onto a rectified 8x8 grid
+        self.corners = np.float32([intersect2, intersect1, intersect4, intersect3])
+        self.transform = self.calcTransform(self.corners)
+
+        return self.calcFieldPositions(self.corners)
+
+    '''
+    Calculates the positions of the squares from the corners of the chess board
+    (upper left, upper right, lower left, lower right)
+    '''
+    def calcFieldPositions(self, corners):
+        (upperLeft, upperRight, lowerLeft, lowerRight) = corners
         fieldPositions = dict()
 
-        stepLeft, offsetLeft = self.calcStep((intersect2,intersect4),8)
-        stepRight, offsetRight = self.calcStep((intersect1, intersect3),8)
+        stepLeft, offsetLeft = self.calcStep((upperLeft,lowerLeft),8)
+        stepRight, offsetRight = self.calcStep((upperRight, lowerRight),8)
         for i in range(8):
-            start = np.array(intersect2)+offsetLeft + i*stepLeft
-            stop = np.array(intersect1)+offsetRight + i*stepRight
+            start = np.array(upperLeft)+offsetLeft + i*stepLeft
+            stop = np.array(upperRight)+offsetRight + i*stepRight
 
             step, offset = self.calcStep((start,stop), 8)
             for j in range(8):
                 fieldPositions[self.abc[j]+str(i+1)] = (start+offset+j*step).astype(int)
 
-        
-        cap.release()        
         return fieldPositions
 
     '''
-    Estimates the average noise of the video stream without motion
+    Checks on a single frame whether the board is where the corners say it is:
+    in the rectified board, edges have to lie on the grid lines between the squares much more often than elsewhere
+    '''
+    def checkBoard(self, frame, minRatio=2.0):
+        board = cv2.cvtColor(self.warpBoard(frame), cv2.COLOR_BGR2GRAY)
+        edges = cv2.Canny(board, 50, 150) > 0
+        lines = np.zeros(edges.shape, bool)
+        for k in range(1, 8):
+            p = k*self.cellSize
+            lines[p-1:p+2, :] = True
+            lines[:, p-1:p+2] = True
+        onLines = edges[lines].mean()
+        offLines = edges[~lines].mean()
+        return onLines > minRatio*max(offLines, 0.01)
+
+    '''
+    Uses a stored calibration if it fits the stream and the frame, returns whether it did
+    '''
+    def loadCalibration(self, stored, frame):
+        if (stored.get('width'), stored.get('height')) != (self.width, self.height):
+            return False
+        self.corners = np.float32(stored['corners'])
+        self.transform = self.calcTransform(self.corners)
+        if not self.checkBoard(frame):
+            return False
+        self.fieldPositions = {key: np.array(point) for (key, point) in stored['fieldPositions'].items()}
+        return True
+
+    '''
+    Stores the board position and noise model in the calibration file
+    '''
+    def saveCalibration(self):
+        calibrationFile.save(self.calibration, 'camera', {
+            'width': self.width,
+            'height': self.height,
+            'corners': self.corners.tolist(),
+            'fieldPositions': {key: [int(v) for v in point] for (key, point) in self.fieldPositions.items()},
+            'noise': self.stillness.noise.state(),
+        })
+
+    '''
+    Seeds the per-square noise model with frames of the video stream without motion
+    Afterwards the model is updated continuously by the stillness detector
     '''
     def estimateNoise(self, noiseSpan=10):
-        noise = []
-        
-        cap = cv2.VideoCapture(self.path)
-        ref,prevFrame = cap.read()
-        prevFrame = cv2.resize(prevFrame,(0,0),fx=self.resize, fy=self.resize)
+        frames = [self.readFrame(latest=True)]
 
-        #collect difference pictures
+        #collect consecutive frames
         for i in range(noiseSpan):
-            ref, frame = cap.read()
-            frame = cv2.resize(frame,(0,0),fx=self.resize, fy=self.resize)
-            
-            noise.append(cv2.absdiff(frame,prevFrame))
-                
-            prevFrame = frame
-            
-        cap.release()
+            frames.append(self.readFrame())
 
-        #return mean difference
-        return np.mean(noise)
+        self.stillness.calibrate(frames)
 
     '''
     Waits for movement in the video stream, then compares the positions before and after the movement.
     Returns the move that was made.
+    If the current sunfish position is given, only its legal moves are considered:
+    the move is returned as soon as one of them clearly explains the changed squares,
+    without waiting for the full settle time
+    If flipped is set, the position is seen from black's side (sunfish rotates the board for black),
+    which is needed to recognize the moves of both players, e.g. in recorded games
     '''
-    def getMove(self):
+    def getMove(self, position=None, flipped=False):
 
-        #variables used to track movement and stillness
-        stillCounter = 0
-        hasMoved = False
-        
-        cap = cv2.VideoCapture(self.path)
-        ref,prevFrame = cap.read()
-        prevFrame = cv2.resize(prevFrame,(0,0),fx=self.resize, fy=self.resize)
+        #skip frames buffered while we weren't looking, e.g. of the robot's move,
+        #and wait until the arm or the last hand left the board
+        prevFrame = self.waitStill()
+        if prevFrame is None:
+            return None
 
         #save the starting position
-        lastPosition = {key:self.getBox(prevFrame,point) for (key,point) in self.fieldPositions.items()}
+        #after a failed recognition the board at that time is compared too, see below
+        references = [self.warpBoard(prevFrame)]
+        self.stillness.reset(prevFrame, self.timestamp)
 
-        while(ref):
+        result = None
+        while True:
             
-            ref, frame = cap.read()
-            frame = cv2.resize(frame,(0,0),fx=self.resize, fy=self.resize)
-
-            #calculate current noise level
-            crntNoise = np.mean(cv2.absdiff(frame,prevFrame))
-
-            #check if movement is occuring and update accordingly
-            #   whether or not movement has already occured
-            #   for how many frames is has stopped
-            if np.absolute(crntNoise-self.avgNoise) < 0.5:
-                stillCounter += 1
-            else:
-                stillCounter = 0
-                hasMoved = True
+            #frames in between are skipped without looking at them
+            frame = self.readFrame(skip=self.stride-1)
+            if frame is None:
+                break
+
+            #check if movement is occuring on the board, tracks when it stopped
+            with metrics.span('stillness'):
+                moving = self.stillness.update(frame, self.timestamp)
+                settled = self.stillness.settled(self.timestamp)
+            metrics.count('frames_analyzed')
+
+            if position is not None and (settled or self.stillness.calm(self.timestamp)):
+                #as soon as the board is calm, check whether a legal move explains the change
+                #before the board settled completely, the winner has to be twice as clear
+                #and no other square may have changed (e.g. under the arm of a hand that paused)
+                with metrics.span('classification'):
+                    for lastBoard in references:
+                        move = self.analyze(self.classify, position, frame, lastBoard,
+                                            self.margin if settled else 2*self.margin, flipped, not settled)
+                        if move is not None:
+                            break
+                if move is not None:
+                    result = self.moveName(move, flipped)
+                    break
+                if settled:
+                    #no legal move fits (yet), e.g. a piece was only lifted: wait for the next movement
+                    print('Could not recognize the move, waiting for more movement')
+                    self.stillness.reset(frame, self.timestamp)
+                    #the starting position stays, a lifted piece may still be put down elsewhere;
+                    #but if the board changed without a move (e.g. a piece was nudged), the next move is found against the current board
+                    references = references[:1] + [self.warpBoard(frame)]
         
             #if there has been movement and it has stopped long enough, the new positions have been established
             #compares the starting positions with the current ones to get the move
-            if stillCounter > 30 and hasMoved:
-                #save current position
-                crntPosition = {key:self.getBox(frame,point) for (key,point) in self.fieldPositions.items()}
-
-                #establish difference between current and starting position
-                #uses variance in the color channels as difference
-                change = {key:np.var(np.mean(cv2.absdiff(crntPosition[key],lastPosition[key]),(0,1))) for key in crntPosition}
-
-                #find squares with the highes difference
-                #best two are involved in the move
-                candidates = sorted(change.keys(), key= lambda x: change[x],reverse=True)
-
-                #use variance in the color channels to determine move direction
-                #little variance indicates either black or white square
-                #higher variance indicates colored chess piece
-                if np.var(np.mean(crntPosition[candidates[0]],(0,1))) > np.var(np.mean(crntPosition[candidates[1]],(0,1))):
-                    result = candidates[1]+candidates[0]
-                else:
-                    result = candidates[0]+candidates[1]
-
+            elif position is None and settled:
+                with metrics.span('classification'):
+                    result = self.analyze(lambda: self.guessMove(self.warpBoard(frame), references[0]))
                 break
-                            
-            prevFrame = frame
+
+            #while nothing happens on the board, check whether it is still where we think it is
+            #the starting position stays valid, it is stored in board coordinates
+            if not moving and not self.stillness.hasMoved:
+                self.idleFrames += 1
+                if self.idleFrames >= self.trackInterval:
+                    self.idleFrames = 0
+                    with metrics.span('tracking'):
+                        realigned = self.analyze(self.checkAlignment, frame)
+                    if realigned:
+                        self.stillness.reset(frame, self.timestamp)
             
-        cap.release()
+        if result is not None:
+            self.lastMove = result
         return result
+
+    '''
+    Reads frames until there was no movement on the board for settleTime seconds, returns the last one
+    Frames buffered before are skipped; returns None if the stream ended
+    '''
+    def waitStill(self):
+        frame = self.readFrame(latest=True)
+        if frame is None:
+            return None
+        self.stillness.reset(frame, self.timestamp)
+        while not self.stillness.still(self.timestamp):
+            frame = self.readFrame(skip=self.stride-1)
+            if frame is None:
+                return None
+            self.stillness.update(frame, self.timestamp)
+        return frame
+
+    '''
+    Follows the board if it moved in the image, returns whether the board position changed
+    Small movements are tracked, the board is only detected again if tracking fails and the board isn't where it was
+    '''
+    def checkAlignment(self, frame):
+        corners, confidence = self.tracker.track(frame)
+        old = (self.corners, self.transform)
+        if confidence < self.tracker.minConfidence:
+            if self.checkBoard(frame):
+                #too few features to track, but the board didn't move
+                self.tracker.reset(self.corners, frame)
+                return False
+            metrics.count('board_detections')
+            try:
+                fieldPositions = self.detectSquares(frame)
+            except (TypeError, ValueError, cv2.error):
+                #no lines found, e.g. the board is covered
+                return False
+        elif corners is not None:
+            metrics.count('board_tracked')
+            self.corners = np.float32(corners)
+            self.transform = self.calcTransform(self.corners)
+            fieldPositions = self.calcFieldPositions(self.corners)
+        else:
+            return False
+
+        if not self.checkBoard(frame):
+            #e.g. the board is covered, keep the old position
+            self.corners, self.transform = old
+            return False
+        print('The board moved in the image, adjusted its position')
+        self.fieldPositions = fieldPositions
+        self.stillness.setTransform(self.transform)
+        self.tracker.reset(self.corners, frame)
+        if self.calibration is not None:
+            self.saveCalibration()
+        return True
+
+    '''
+    Runs fn on the executor if there is one and waits for the result
+    '''
+    def analyze(self, fn, *args):
+        if self.executor is None:
+            return fn(*args)
+        return self.executor.submit(fn, *args).result()
+
+    '''
+    Returns the legal move that explains the change between a frame and the rectified starting board, or None
+    '''
+    def classify(self, position, frame, lastBoard, margin, flipped=False, strict=False):
+        crntBoard = self.warpBoard(frame)
+        return self.matchMove(position, self.squareDiff(crntBoard, lastBoard).mean(axis=2), margin, flipped, strict)
+
+    '''
+    Guesses the move from the two squares that changed the most between two rectified boards
     '''
-    Returns a clipping of the image around position
-    Using a box around the position reduces the impact of noise
+    def guessMove(self, crntBoard, lastBoard):
+        #establish difference between current and starting position
+        #uses variance in the color channels as difference
+        change = self.squareDiff(crntBoard, lastBoard).var(axis=2)
+
+        #find squares with the highes difference
+        #best two are involved in the move
+        candidates = np.argsort(change, axis=None)[::-1]
+        first = np.unravel_index(candidates[0], change.shape)
+        second = np.unravel_index(candidates[1], change.shape)
+
+        #use variance in the color channels to determine move direction
+        #little variance indicates either black or white square
+        #higher variance indicates colored chess piece
+        colorVariance = self.squareMeans(crntBoard).var(axis=2)
+        if colorVariance[first] > colorVariance[second]:
+            return str(self.squareNames[second]+self.squareNames[first])
+        else:
+            return str(self.squareNames[first]+self.squareNames[second])
+
+    '''
+    Scores every legal move of a sunfish position against the per-square change map (8,8)
+    A move gains for every square it touches that changed and loses for every square it touches
+    that didn't change and for every changed square it can't explain.
+    Returns the best move if its lead over the second best is at least margin times its own score
+    and all of its squares changed more than their noise threshold, otherwise None
+    Moves that only touch squares of the best move (e.g. the rook's move when castling) aren't rivals,
+    they can't explain the best move's other squares, which changed more than the noise
+    If strict is set, no move is returned while a square outside the best move changed more than the noise
+    '''
+    def matchMove(self, position, change, margin, flipped=False, strict=False):
+        base = np.median(change)
+        scale = change.max() - base
+        if scale <= 0:
+            return None
+        z = (change - base)/scale - self.changeThreshold
+        unexplained = np.maximum(z, 0).sum()
+
+        scores = []
+        for move in position.gen_moves():
+            cells = tuple(zip(*self.moveCells(position, move, flipped)))
+            score = z[cells].sum() - (unexplained - np.maximum(z[cells], 0).sum())
+            scores.append((score, move, cells))
+        if not scores:
+            return None
+        scores.sort(key=lambda s: s[0], reverse=True)
+
+        score, move, cells = scores[0]
+        squares = set(zip(*cells))
+        rivals = [s for (s, _, c) in scores[1:] if not set(zip(*c)) <= squares]
+        second = rivals[0] if rivals else -np.inf
+        threshold = self.stillness.noise.threshold()
+        if not (score > 0 and score - second >= margin*score and (change[cells] > threshold[cells]).all()):
+            return None
+        if strict:
+            unexplained = change - base > threshold
+            unexplained[cells] = False
+            if unexplained.any():
+                return None
+        return move
+
+    '''
+    Returns the cells (row, column) of the rectified board that a move of a sunfish position changes
+    Includes the rook when castling and the pawn that is captured en passant
+    '''
+    def moveCells(self, position, move, flipped=False):
+        i, j = move
+        squares = [i, j]
+        piece = position.board[i]
+        if piece == 'K' and abs(j-i) == 2:
+            squares += [91, j+1] if j < i else [98, j-1]
+        elif piece == 'P' and j == position.ep:
+            squares.append(j+10)
+        return [self.cell(square, flipped) for square in squares]
+
+    '''
+    Returns the cell (row, column) of the rectified board for a square index of a sunfish board
+    Sunfish boards have 10 columns and 12 rows, A1 is at index 91; flipped boards are rotated by 180 degrees
+    '''
+    def cell(self, square, flipped=False):
+        if flipped:
+            square = 119 - square
+        rank, fil = divmod(square - 91, 10)
+        return (-rank, 7-fil)
+
+    '''
+    Returns the name of a sunfish move, e.g. e2e4
+    '''
+    def moveName(self, move, flipped=False):
+        return str(self.squareNames[self.cell(move[0], flipped)] + self.squareNames[self.cell(move[1], flipped)])
+
+    '''
+    Returns the next (already resized) frame of the stream, or the newest one if latest is set
+    skip frames are passed over; the time the frame was read is stored in self.timestamp
+    Returns None if the stream ended
+    '''
+    def readFrame(self, latest=False, skip=0):
+        after = self.seq + skip
+        with metrics.span('frame_read'):
+            frame = self.grabber.latest(after) if latest else self.grabber.next(after)
+        if frame is None:
+            return None
+        metrics.count('frames_skipped', frame.seq - self.seq - 1)
+        self.seq = frame.seq
+        self.timestamp = frame.timestamp
+        return frame.image
+
+    '''
+    Stops reading the stream and stores the noise model learned during the session
+    '''
+    def close(self):
+        self.grabber.stop()
+        if self.calibration is not None:
+            self.saveCalibration()
+
+    '''
+    Calculates the perspective transform from the corners of the board
+    (upper left, upper right, lower left, lower right) to the rectified 8x8 grid
     '''
-    def getBox(self, image, position, size=8):  
-        (x,y) = position
-        return image[y-size:y+size,x-size:x+size]
+    def calcTransform(self, corners):
+        size = 8*self.cellSize
+        target = np.float32([(0,0), (size,0), (0,size), (size,size)])
+        return cv2.getPerspectiveTransform(np.float32(corners), target)
+
+    '''
+    Warps a frame onto the rectified board, every square becomes a cellSize x cellSize cell
+    '''
+    def warpBoard(self, frame):
+        size = 8*self.cellSize
+        return cv2.warpPerspective(frame, self.transform, (size, size))
+
+    '''
+    Returns the inner part of every cell of a rectified board as an (8,c,8,c,C) view
+    Ignoring the border of the cells reduces the impact of noise and misalignment
+    '''
+    def squareCells(self, board):
+        c, m = self.cellSize, self.cellMargin
+        cells = board.reshape(8, c, 8, c, -1)
+        return cells[:, m:c-m, :, m:c-m]
+
+    '''
+    Returns the mean color of every square of a rectified board as an (8,8,C) array
+    '''
+    def squareMeans(self, board):
+        return self.squareCells(board).mean(axis=(1,3))
+
+    '''
+    Returns the mean absolute difference of every square between two rectified boards as an (8,8,C) array
+    '''
+    def squareDiff(self, board, other):
+        return self.squareCells(cv2.absdiff(board, other)).mean(axis=(1,3))
+
+    '''
+    Finds the lines of an edge image whose angles lie in the given ranges (from, to) in polar coordinates
+    Board edges that are slightly tilted get too few votes at a resolution of one degree, so a quarter degree is used
+    '''
+    def houghLines(self, edges, *ranges, threshold=70):
+        found = [cv2.HoughLines(edges, 1, np.pi / 720, threshold, None, 0, 0, start, stop) for (start, stop) in ranges]
+        found = [lines for lines in found if lines is not None]
+        return np.vstack(found) if found else None
+
+    '''
+    Fits a line (start and end point) to the edge points (n,2) that lie within distance px of it
+    Returns the line unchanged if there are too few of them
+    '''
+    def fitLine(self, points, line, distance=2, minPoints=10):
+        (x1,y1), (x2,y2) = line
+        direction = np.float32([x2-x1, y2-y1])
+        normal = np.float32([-direction[1], direction[0]])/np.linalg.norm(direction)
+        near = points[np.abs((points - (x1,y1)).dot(normal)) <= distance]
+        if len(near) < minPoints:
+            return line
+        vx, vy, x0, y0 = cv2.fitLine(near, cv2.DIST_HUBER, 0, 0.01, 0.01).ravel()
+        return ((x0, y0), (x0+vx, y0+vy))
 
     '''
     Transforms polar coordinates of lines to cartesian coordinates of start and end points
@@ -217,7 +561,7 @@ class MoveDetector:
         return result
 
     '''
-    Calculates the intersection of two lines
+    Calculates the intersection of two lines (with sub-pixel precision)
     '''
     def getIntersection(self, line1, line2):
         (x1,y1) = line1[0]
@@ -227,7 +571,7 @@ class MoveDetector:
         denom = (x1-x2)*(y3-y4)-(y1-y2)*(x3-x4)
         x = ((x1*y2-y1*x2)*(x3-x4)-(x1-x2)*(x3*y4-y3*x4))/denom
         y = ((x1*y2-y1*x2)*(y3-y4)-(y1-y2)*(x3*y4-y3*x4))/denom
-        return (int(x),int(y))
+        return (x, y)
 
     '''
     Calculates the vector that goes from the line starting point to its end point if repeated nrParts times
@@ -239,7 +583,9 @@ class MoveDetector:
 
 
 if __name__ == '__main__':
-    md = MoveDetector('http://192.168.178.39/webcam/?action=stream')
+    import sys
+
+    md = MoveDetector(sys.argv[1] if len(sys.argv) > 1 else 'http://192.168.178.39/webcam/?action=stream')
     while(True):
         print(md.getMove())
         if input()=='q':
@@ -0,0 +1,65 @@
+import numpy as np
+
+
+class NoiseModel:
+
+    '''
+    Keeps a running per-square mean and variance of the differences between consecutive frames
+    without movement, so that the thresholds follow slow changes of the lighting during a session.
+    The first frames are averaged equally (warmup), afterwards older frames fade out exponentially
+    with the weight alpha.
+    A square changed significantly if its difference is more than sigmas standard deviations above its mean.
+    Needs the shape of the per-square differences, usually (8,8)
+    '''
+    def __init__(self, shape=(8,8), alpha=0.02, sigmas=4.0, minStd=0.5):
+        self.shape = shape
+        self.alpha = alpha
+        self.sigmas = sigmas
+        self.minStd = minStd
+        self.n = 0
+        self.mean = np.zeros(shape)
+        self.var = np.zeros(shape)
+
+    '''
+    Adds the per-square differences of two still frames to the model
+    '''
+    def update(self, diff):
+        self.n += 1
+        weight = max(1.0/self.n, self.alpha)
+        delta = diff - self.mean
+        self.mean += weight*delta
+        self.var = (1-weight)*(self.var + weight*delta*delta)
+
+    '''
+    Returns the standard deviation of every square, which is never below minStd
+    '''
+    def std(self):
+        return np.maximum(np.sqrt(self.var), self.minStd)
+
+    '''
+    Returns the per-square thresholds above which a difference is not explained by noise
+    '''
+    def threshold(self, sigmas=None):
+        return self.mean + (self.sigmas if sigmas is None else sigmas)*self.std()
+
+    '''
+    Returns how many standard deviations every difference lies above the mean of its square
+    '''
+    def score(self, diff):
+        return (diff - self.mean)/self.std()
+
+    '''
+    Returns the model as a dict of lists (for the calibration file)
+    '''
+    def state(self):
+        return {'n': self.n, 'mean': self.mean.tolist(), 'var': self.var.tolist()}
+
+    '''
+    Restores the model from a dict created by state, returns whether it fits the shape
+    '''
+    def load(self, state):
+        mean, var = np.array(state['mean'], dtype=float), np.array(state['var'], dtype=float)
+        if mean.shape != self.shape or var.shape != self.shape:
+            return False
+        self.n, self.mean, self.var = int(state['n']), mean, var
+        return True
@@ -1,12 +1,18 @@
-import requests
 import time
+import requests
+from transport import Transport
+from motionPlanner import MotionPlanner
+from gcodeCompiler import GcodeCompiler
+import metrics
 
 class Octoprint:
 
     def __init__(self, host='http://192.168.178.39', api_key='', a1=(26,38), 
                  min_z=53, z_up=40, z_park=150, grab_ex=6, pawn_grab_ex_offset=4, 
                  field_size=27, sleep=True, sleep_park=10, sleep_home=42, 
-                 sleep_move=19, sleep_remove=14):
+                 sleep_move=19, sleep_remove=14, jog_speed=6000, extrude_speed=300,
+                 timeout=(3.05, 10), retries=3, wait='sleep', poll_interval=0.2, poll_timeout=60,
+                 park_xy=(230,230), drop_xy=(0,0)):
         """Create a new Octoprint object, that can send commands to your Octoprint instance.
 
         host -- The URL of your Octoprint instance. 
@@ -23,14 +29,24 @@ class Octoprint:
         sleep_home -- how long to delay after a home command
         sleep_move -- how long to delay after a move command
         sleep_remove -- how long to delay after a remove command
+        jog_speed -- feedrate in mm/min for jogs that don't specify their own speed
+        extrude_speed -- feedrate in mm/min of the extruder motor that opens and closes the gripper
+        timeout -- (connect, read) timeout in seconds for every request to Octoprint
+        retries -- how often to retry a request that could not be delivered
+        wait -- how to wait for the printer to finish a motion:
+                'sleep' sends g-code as commands and waits the fixed delays above,
+                'poll' prints every motion as a small job that ends with M400 and polls the job state until it is done.
+                    The fixed delays are then only used as an upper bound.
+        poll_interval -- how often to ask for the job state in 'poll' mode
+        poll_timeout -- upper bound of the wait in 'poll' mode for motions that don't have their own delay
+        park_xy -- tuple; the x-/y- parking position of the gripper in mm, where it doesn't obstruct the camera view
+        drop_xy -- tuple; the x-/y- position in mm where captured chess pieces are dropped
         """
 
 
         self.base_url = host
         self.api_key = api_key
-        self.printhead = self.base_url + '/api/printer/printhead'
-        self.extruder = self.base_url + '/api/printer/tool'
-        self.headers = { 'Content-Type': 'application/json', 'X-Api-Key': self.api_key}
+        self.transport = Transport(host, api_key, timeout=timeout, retries=retries)
         self.a1 = a1
         self.min_z = min_z
         self.z_up = z_up
@@ -43,25 +59,79 @@ class Octoprint:
         self.sleep_move = sleep_move
         self.sleep_remove = sleep_remove
         self.sleep = sleep
+        self.jog_speed = jog_speed
+        self.extrude_speed = extrude_speed
+        self.wait = wait
+        self.poll_interval = poll_interval
+        self.poll_timeout = poll_timeout
+        #alternating job names, so that a finished job can't be mistaken for the one just uploaded
+        self.job_names = ('chess-a.gcode', 'chess-b.gcode')
+        self.jobs = 0
+        self.park_xy = park_xy
+        self.drop_xy = drop_xy
+        self.planner = MotionPlanner(self)
+        self.compiler = GcodeCompiler(self)
         print('To close the gripper with the extruder motor, cold extrusion must be enabled (make sure there is no filament in the printer!!!). Send g-code command \'M302 P1;\' to your printer through the Octoprint terminal. Not all firmwares support this command. You might need to adapt your firmware accordingly.')
 
+    def send(self, gcode, delay=0):
+        """Sends the g-code of one physical action to the printer in a single request and waits for it to finish.
+
+        gcode -- list of g-code lines
+        delay -- how long the action takes at most (the fixed delay in 'sleep' mode)
+        """
+        if self.wait == 'poll':
+            name = self.job_names[self.jobs % 2]
+            self.jobs += 1
+            self.transport.upload(name, list(gcode) + ['M400'])
+            with metrics.span('motion_wait', mode='poll'):
+                done = self.wait_for_job(name, delay or self.poll_timeout)
+            if not done:
+                print('Printer did not finish the motion within %s seconds' % (delay or self.poll_timeout))
+        else:
+            self.transport.command(gcode)
+            if self.sleep and delay:
+                with metrics.span('motion_wait', mode='sleep'):
+                    time.sleep(delay)
+
+    def wait_for_job(self, name, timeout):
+        """Polls the job state until the job with the given file name has been printed completely.
+        Returns False if that didn't happen within timeout seconds."""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            job = self.transport.job()
+            state = job.get('state', '')
+            if state.startswith(('Error', 'Offline', 'Closed')):
+                raise RuntimeError('Printer is not operational: ' + state)
+            file = (job.get('job') or {}).get('file') or {}
+            completion = (job.get('progress') or {}).get('completion') or 0
+            if file.get('name') == name and state.startswith('Operational') and completion >= 100:
+                return True
+            time.sleep(self.poll_interval)
+        return False
+
+    def jog(self, x=None, y=None, z=None, speed=None, absolute=True):
+        """Returns the g-code for a jog of the print head (same semantics as Octoprint's jog command)."""
+        axes = ''.join(' %s%s' % (axis, value) for axis, value in (('X', x), ('Y', y), ('Z', z)) if value is not None)
+        move = 'G1%s F%d' % (axes, speed or self.jog_speed)
+        return ['G90', move] if absolute else ['G91', move, 'G90']
+
+    def extrude(self, amount):
+        """Returns the g-code to 'extrude' the given amount, i.e. to close (or open, if negative) the gripper."""
+        return ['G91', 'M83', 'G1 E%s F%d' % (amount, self.extrude_speed), 'M82', 'G90']
+
     def home(self):
         """Homes the x/y/z axis of the printer. Somehow this doesn't always work for me."""
-        command = { 'command': 'home', 'axes': 'x, y, z' }
-        r = requests.post(self.printhead, headers=self.headers, json=command)
         print('sent homing command')
-        if self.sleep:
-            time.sleep(self.sleep_home)
+        self.send(['G91', 'G28 X0 Y0 Z0', 'G90'], self.sleep_home)
 
     def move(self, x, y):
         """Moves the gripper over a given chess field.
         Expects two integers, e.g., for field A1, call move(1,1), for C5 call move(3,5)."""
+        self.send(self.move_gcode(x, y))
 
-        command = {'command': 'jog', 
-                    'x': self.a1[0] + (x-1)*self.field_size,
-                    'y': self.a1[1] + (y-1)*self.field_size,
-                    'absolute': True }
-        r = requests.post(self.printhead, headers=self.headers, json=command)
+    def move_gcode(self, x, y):
+        return self.jog(x=self.a1[0] + (x-1)*self.field_size,
+                        y=self.a1[1] + (y-1)*self.field_size)
 
     def remove(self, x, y, pawn=False):
         """ Removes the chess piece at the given coordinates. 
@@ -70,79 +140,41 @@ class Octoprint:
         y -- the y-coordinate. 1,2,3,..,8
         pawn -- whether the piece to move is a pawn
         """
-        self.grab_at(x,y,pawn)
-        command = {'command': 'jog', 
-                    'x': 0,
-                    'y': 0,
-                    'absolute': True }
-        r = requests.post(self.printhead, headers=self.headers, json=command)
-
         ex = self.grab_ex+self.pawn_grab_ex_offset if pawn else self.grab_ex
-        command = {'command': 'extrude', 'amount': (-1)*ex}
-        r = requests.post(self.extruder, headers=self.headers, json=command)
-        if self.sleep:
-            time.sleep(self.sleep_remove)
+        self.send(self.grab_at_gcode(x, y, pawn) + self.jog(x=self.drop_xy[0], y=self.drop_xy[1]) + self.extrude((-1)*ex),
+                  self.sleep_remove)
 
     def move_down(self):
         """Moves the gripper down to the board"""
-        command = {'command': 'jog',
-                    'z': self.min_z, 
-                    'speed': 5000,
-                    'absolute': True }
-        r = requests.post(self.printhead, headers=self.headers, json=command)
+        self.send(self.jog(z=self.min_z, speed=5000))
 
     def grab(self, pawn=False):
         """Grabs the figure underneath the current gripper position.
 
         pawn -- whether the piece to move is a pawn"""
-        command = {'command': 'jog',
-                    'z': self.min_z,
-                    'speed': 5000,
-                    'absolute': True }
-        r = requests.post(self.printhead, headers=self.headers, json=command)
+        self.send(self.grab_gcode(pawn))
 
+    def grab_gcode(self, pawn=False):
         ex = self.grab_ex+self.pawn_grab_ex_offset if pawn else self.grab_ex
-        command = {'command': 'extrude', 'amount': ex}
-        r = requests.post(self.extruder, headers=self.headers, json=command)
+        return (self.jog(z=self.min_z, speed=5000)
+                + self.extrude(ex)
+                + self.jog(z=40, speed=5000, absolute=False))
 
-        command = {'command': 'jog',
-                    'z': 40,
-                    'speed': 5000,
-                    'absolute': False}
-        r = requests.post(self.printhead, headers=self.headers, json=command)
-
-        
     def put_down(self, pawn=False):
         """Puts down a carried chess piece at the current position. 
 
         pawn -- whether the carried piece is a pawn (default: False)
         """
+        self.send(self.put_down_gcode(pawn))
+
+    def put_down_gcode(self, pawn=False):
         #x_move = -1-self.pawn_grab_ex_offset/2 if pawn else -1
-        command = {'command': 'jog',
-                    'x': -1,
-                    'absolute': False}
-        r = requests.post(self.printhead, headers=self.headers, json=command)
-
-        command = {'command': 'jog',
-                    'z': self.min_z,
-                    'speed': 5000, 
-                    'absolute': True }
-        r = requests.post(self.printhead, headers=self.headers, json=command)
-       
         ex = self.grab_ex+self.pawn_grab_ex_offset if pawn else self.grab_ex
-        command = {'command': 'extrude', 'amount': (-1)*ex}
-        r = requests.post(self.extruder, headers=self.headers, json=command)
-
-        command = {'command': 'jog',
-                    'x': 1,
-                    'absolute': False}
-        r = requests.post(self.printhead, headers=self.headers, json=command)
-
-        command = {'command': 'jog',
-                    'z': self.z_park,
-                    'speed': 5000,
-                    'absolute': True}
-        r = requests.post(self.printhead, headers=self.headers, json=command)
+        return (self.jog(x=-1, absolute=False)
+                + self.jog(z=self.min_z, speed=5000)
+                + self.extrude((-1)*ex)
+                + self.jog(x=1, absolute=False)
+                + self.jog(z=self.z_park, speed=5000))
 
     def grab_at(self, x, y, pawn=False):
         """Grab the chess piece at the given position. 
@@ -151,9 +183,10 @@ class Octoprint:
         y -- the y-coordinate. 1,2,3,..,8
         pawn -- whether the piece to move is a pawn
         """
+        self.send(self.grab_at_gcode(x, y, pawn))
 
-        self.move(x,y)
-        self.grab(pawn=pawn)
+    def grab_at_gcode(self, x, y, pawn=False):
+        return self.move_gcode(x, y) + self.grab_gcode(pawn)
 
     def put_down_at(self, x, y, pawn=False):
         """Place the chess piece at the given position.
@@ -162,8 +195,10 @@ class Octoprint:
         y -- the y-coordinate. 1,2,3,..,8
         pawn -- whether the piece to move is a pawn
         """
-        self.move(x,y)
-        self.put_down(pawn=pawn)
+        self.send(self.put_down_at_gcode(x, y, pawn))
+
+    def put_down_at_gcode(self, x, y, pawn=False):
+        return self.move_gcode(x, y) + self.put_down_gcode(pawn)
 
     def from_to(self, x0,y0,x1,y1, pawn=False):
         """Move a chess piece from a given field on the board to another given field on the board. 
@@ -174,80 +209,80 @@ class Octoprint:
         y1 -- the y-coordinate to place the piece. 1,2,3,..,8
         pawn -- whether the piece to move is a pawn
         """
-        self.grab_at(x0,y0, pawn=pawn)
-        self.put_down_at(x1,y1, pawn=pawn)
-        self.park()
-        if self.sleep:
-            time.sleep(self.sleep_move)
+        self.send(self.grab_at_gcode(x0, y0, pawn) + self.put_down_at_gcode(x1, y1, pawn) + self.park_gcode(),
+                  self.sleep_park + self.sleep_move)
      
 
+    def play_move(self, pos, move):
+        """Performs a sunfish move of the robot (including captures, en passant and castling) as one precompiled program.
+        Returns the estimated and actual time saved compared to separate remove/from_to calls.
+
+        pos -- the sunfish Position before the move, from the robot's perspective
+        move -- the move as a tuple of sunfish squares
+        """
+        if self.compiler.promotes(pos, move):
+            print('Please replace the promoted pawn with a queen')
+        return self.run(self.compiler.program(pos, move))
+
+    def run(self, program):
+        """Sends a compiled Program (see GcodeCompiler) in one shot and waits for it to finish."""
+        start = time.time()
+        self.send(program.gcode, program.delay)
+        actual = time.time() - start
+
+        saved = {'estimated': program.legacy - program.estimate, 'actual': program.delay - actual}
+        print('Turn took %.1f s (estimated %.1f s), saved %.1f s estimated / %.1f s actual'
+              % (actual, program.estimate, saved['estimated'], saved['actual']))
+        return saved
+
+    def still_homed(self):
+        """Returns whether the printer is still connected and idle, so that the position it was homed to should still be valid.
+
+        Octoprint can't report whether the axes are homed. A printer that is still operational wasn't reset,
+        unless Octoprint reconnected to it in the meantime.
+        """
+        try:
+            flags = self.transport.get('/api/printer', params={'exclude': 'temperature,sd'}).json()['state']['flags']
+        except (requests.RequestException, ValueError, KeyError):
+            return False
+        return flags.get('operational', False) and not flags.get('error', False) and not flags.get('printing', False)
+
     def park(self):
         """Move to a parking position that does not obstruct the camera view."""
-        command = {'command': 'jog',
-                    'z': self.z_park,
-                    'speed': 5000, 
-                    'absolute': True }
-        r = requests.post(self.printhead, headers=self.headers, json=command)
-        command = {'command': 'jog',
-                    'x': 230,
-                    'y': 230,
-                    'speed': 5000, 
-                    'absolute': True }
-        r = requests.post(self.printhead, headers=self.headers, json=command)
-        if self.sleep:
-            time.sleep(self.sleep_park)
+        self.send(self.park_gcode(), self.sleep_park)
+
+    def park_gcode(self):
+        return self.jog(z=self.z_park, speed=5000) + self.jog(x=self.park_xy[0], y=self.park_xy[1], speed=5000)
 
     def tantrum(self):
         """Do some random movements that throw chess pieces from the board"""
-        self.move(8,4)
-        self.move_down()
-        self.move(1,2)
-        self.move(8,1)
-        self.move(1,7)
+        self.send(self.move_gcode(8,4)
+                  + self.jog(z=self.min_z, speed=5000)
+                  + self.move_gcode(1,2)
+                  + self.move_gcode(8,1)
+                  + self.move_gcode(1,7))
 
     def shake(self):
         """Do some weird movements"""
-        self.move(5,5)
-        self.move_down()
+        gcode = self.move_gcode(5,5) + self.jog(z=self.min_z, speed=5000)
         for i in range(10):
-            self.move(5,5)
-            self.move(4,5)
+            gcode += self.move_gcode(5,5)
+            gcode += self.move_gcode(4,5)
+        self.send(gcode)
 
     def prod(self):
         """Prod the white king from the board"""
-        command = {'command': 'jog',
-                    'x': 147,
-                    'y': 70,
-                    'z': 74,
-                    'speed': 5000, 
-                    'absolute': True }
-        r = requests.post(self.printhead, headers=self.headers, json=command)
-        command = {'command': 'jog',
-                    'x': 147,
-                    'y': 15,
-                    'z': 74,
-                    'speed': 5000, 
-                    'absolute': True }
-        r = requests.post(self.printhead, headers=self.headers, json=command)
+        gcode = (self.jog(x=147, y=70, z=74, speed=5000)
+                 + self.jog(x=147, y=15, z=74, speed=5000))
         for i in range(3):
-            command = {'command': 'jog',
-                        'x': 147,
-                        'y': 120,
-                        'z': 74,
-                        'speed': 5000, 
-                        'absolute': True }
-            r = requests.post(self.printhead, headers=self.headers, json=command)
-            command = {'command': 'jog',
-                        'x': 107,
-                        'y': 120,
-                        'z': 74,
-                        'speed': 5000, 
-                        'absolute': True }
-            r = requests.post(self.printhead, headers=self.headers, json=command)
+            gcode += self.jog(x=147, y=120, z=74, speed=5000)
+            gcode += self.jog(x=107, y=120, z=74, speed=5000)
+        self.send(gcode)
 
 if __name__ == '__main__':
+    import sys
     import secrets
 
-    o = Octoprint(api_key=secrets.api_key, sleep=False)
+    o = Octoprint(host=sys.argv[1] if len(sys.argv) > 1 else 'http://192.168.178.39', api_key=secrets.api_key, sleep=False)
     
     o.from_to(1,1,4,4)
@@ -0,0 +1,84 @@
+import textwrap
+from sunfish import render
+
+
+def square_name(square, white=True):
+    """Returns the name of a sunfish square, e.g. e4. Boards of black (white=False) are rotated."""
+    return render(square if white else 119 - square)
+
+
+def is_legal(pos, move):
+    """Returns whether a pseudo-legal sunfish move doesn't leave the own king capturable
+    (sunfish also lets the king be captured on the squares it passed while castling)."""
+    after = pos.move(move)
+    return not any(after.board[j] == 'k' or abs(j - after.kp) < 2 for _, j in after.gen_moves())
+
+
+def legal_moves(pos):
+    return [move for move in pos.gen_moves() if is_legal(pos, move)]
+
+
+def san(pos, move, white=True):
+    """Returns the standard algebraic notation of a move, e.g. Nbd7, exd6, O-O or e8=Q#.
+
+    pos -- the sunfish position before the move, from the perspective of the side to move
+    move -- the move as a tuple of sunfish squares
+    white -- whether white is to move
+    """
+    i, j = move
+    piece = pos.board[i]
+    if piece == 'K' and abs(j - i) == 2:
+        #the board of black is rotated, so its king side is on the other side
+        text = 'O-O' if (j > i) == white else 'O-O-O'
+    elif piece == 'P':
+        text = square_name(j, white)
+        if pos.board[j] != '.' or j == pos.ep:
+            text = square_name(i, white)[0] + 'x' + text
+        if 21 <= j <= 28:
+            #sunfish always promotes to a queen
+            text += '=Q'
+    else:
+        others = [m[0] for m in legal_moves(pos) if m[1] == j and m[0] != i and pos.board[m[0]] == piece]
+        origin = square_name(i, white)
+        prefix = ''
+        if others:
+            if all(square_name(o, white)[0] != origin[0] for o in others):
+                prefix = origin[0]
+            elif all(square_name(o, white)[1] != origin[1] for o in others):
+                prefix = origin[1]
+            else:
+                prefix = origin
+        text = piece + prefix + ('x' if pos.board[j] != '.' else '') + square_name(j, white)
+
+    after = pos.move(move)
+    again = after.rotate()
+    if any(again.board[k] == 'k' for _, k in again.gen_moves()):
+        text += '#' if not legal_moves(after) else '+'
+    return text
+
+
+def write(path, moves, headers=None, result='*'):
+    """Writes one game as PGN.
+
+    path -- the file to write
+    moves -- list of (san, comment) tuples, comment may be None
+    headers -- dict of more tag pairs (the seven required ones get placeholders)
+    result -- '1-0', '0-1', '1/2-1/2' or '*'
+    """
+    tags = {'Event': '?', 'Site': '?', 'Date': '????.??.??', 'Round': '-', 'White': '?', 'Black': '?', 'Result': result}
+    tags.update(headers or {})
+    tokens = []
+    for ply, (text, comment) in enumerate(moves):
+        if ply % 2 == 0:
+            tokens.append('%d.' % (ply//2 + 1))
+        elif moves[ply-1][1]:
+            #black's move needs its number again after a comment
+            tokens.append('%d...' % (ply//2 + 1))
+        tokens.append(text)
+        if comment:
+            tokens.append('{%s}' % comment)
+    tokens.append(result)
+    with open(path, 'w') as f:
+        for key, value in tags.items():
+            f.write('[%s "%s"]\n' % (key, str(value).replace('\\', '\\\\').replace('"', '\\"')))
+        f.write('\n' + textwrap.fill(' '.join(tokens), 79) + '\n\n')
@@ -0,0 +1,134 @@
+import hashlib
+import os
+import struct
+from collections import OrderedDict, namedtuple
+
+
+Entry = namedtuple('Entry', 'move score depth book')
+
+#file layout: header (magic, version, number of records), then one fixed-size record per position:
+#8 byte key, from square, to square, score, depth, book flag
+HEADER = struct.Struct('<4sHI')
+RECORD = struct.Struct('<8sBBiBB')
+MAGIC = b'CHPC'
+VERSION = 1
+
+
+class PositionCache:
+
+    def __init__(self, path, max_entries=100000):
+        """A disk-backed cache of search results, keyed by sunfish Position.
+
+        Entries are kept in least-recently-used order; when the cache is full, the least recently used
+        entry is evicted. An entry is only replaced by a search that went at least as deep.
+        Opening book entries (book=True) are never evicted or replaced.
+
+        path -- the file the cache is loaded from and saved to
+        max_entries -- how many positions to keep at most
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.load()
+
+    def key(self, pos):
+        """Returns a stable 8 byte key of a position (Python's own hash of strings changes between runs)."""
+        data = repr((pos.board, pos.wc, pos.bc, pos.ep, pos.kp)).encode()
+        return hashlib.blake2b(data, digest_size=8).digest()
+
+    def get(self, pos):
+        """Returns the Entry of a position or None."""
+        key = self.key(pos)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def put(self, pos, move, score, depth, book=False):
+        """Stores the result of a search in pos, unless a deeper result or a book move is already stored."""
+        key = self.key(pos)
+        old = self.entries.get(key)
+        if old is not None and (old.book and not book or old.depth > depth):
+            self.entries.move_to_end(key)
+            return
+        self.entries[key] = Entry(tuple(move), score, min(depth, 255), book)
+        self.entries.move_to_end(key)
+        self.evict()
+
+    def evict(self):
+        if len(self.entries) <= self.max_entries:
+            return
+        for key in list(self.entries):
+            if not self.entries[key].book:
+                del self.entries[key]
+                if len(self.entries) <= self.max_entries:
+                    return
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            magic, version, count = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                print('Ignoring position cache %s with unknown format' % self.path)
+                return
+            data = f.read(count*RECORD.size)
+        for key, i, j, score, depth, book in RECORD.iter_unpack(data):
+            self.entries[key] = Entry((i, j), score, depth, bool(book))
+
+    def save(self, entries=None):
+        """Writes the cache to disk. The file is replaced atomically, so a crash never leaves a broken cache.
+
+        entries -- the (key, Entry) pairs to write instead of the cache's own, e.g. a copy taken under a lock
+        """
+        entries = list(self.entries.items()) if entries is None else entries
+        tmp = self.path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(entries)))
+            for key, entry in entries:
+                f.write(RECORD.pack(key, entry.move[0], entry.move[1], entry.score, entry.depth, entry.book))
+        os.replace(tmp, self.path)
+
+
+def build_book(cache, plies=1, budget=1):
+    """Precomputes the robot's replies for the first moves of the human (white) and stores them as book entries.
+
+    cache -- the PositionCache to fill
+    plies -- how many human moves deep the book goes; every legal human move is followed
+    budget -- how long to search every reply in seconds
+    """
+    from sunfish import Position, initial, MATE_LOWER
+    from engine import InterruptibleSearcher, think
+
+    searcher = InterruptibleSearcher()
+    start = Position(initial, 0, (True,True), (True,True), 0, 0)
+    frontier = [[start]]
+    for ply in range(plies):
+        following = []
+        for hist in frontier:
+            for move in hist[-1].gen_moves():
+                pos = hist[-1].move(move)
+                if pos.score <= -MATE_LOWER:
+                    continue
+                result = think(searcher, pos, hist + [pos], budget)
+                if result is None or result[1] is None:
+                    #no reply, e.g. the robot is mated or stalemated
+                    continue
+                depth, reply, score = result
+                cache.put(pos, reply, score, depth, book=True)
+                following.append(hist + [pos, pos.move(reply)])
+        frontier = following
+        print('Book: %d positions after %d plies' % (len(following), ply+1))
+    cache.save()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Builds an opening book into a position cache.')
+    parser.add_argument('path', nargs='?', default='positions.bin', help='the position cache file')
+    parser.add_argument('--plies', type=int, default=1, help='how many human moves deep the book goes')
+    parser.add_argument('--time', type=float, default=1, help='seconds to search every reply')
+    args = parser.parse_args()
+
+    build_book(PositionCache(args.path), args.plies, args.time)
@@ -0,0 +1,149 @@
+import argparse
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from engine import search_worker
+from main import play
+from motionQueue import MotionQueue
+from moveDetection import MoveDetector
+from octoprint import Octoprint
+from positionCache import PositionCache
+
+
+class EnginePool:
+
+    def __init__(self, workers=None, cache=None, save_interval=60):
+        """Searches for many boards at once on a pool of worker processes.
+
+        Book moves and cached results are looked up here, so all boards share one PositionCache.
+        The cache is written to disk by a background thread every save_interval seconds if it changed,
+        and once more on shutdown, so that no board waits for the disk.
+
+        workers -- number of worker processes (default: number of cores)
+        cache -- a PositionCache or None
+        save_interval -- seconds between writes of the cache
+        """
+        self.executor = ProcessPoolExecutor(workers)
+        self.cache = cache
+        self.lock = threading.Lock()
+        self.changed = False
+        self.stopped = threading.Event()
+        self.saver = None
+        if cache is not None:
+            self.saver = threading.Thread(target=self.saveLoop, args=(save_interval,), name='cache saver', daemon=True)
+            self.saver.start()
+
+    def search(self, pos, hist, budget):
+        """Same as engine.think, but runs on a worker process. Can be called from many threads at once."""
+        hint = None
+        if self.cache is not None:
+            with self.lock:
+                entry = self.cache.get(pos)
+            if entry is not None and entry.move in pos.gen_moves():
+                if entry.book:
+                    return (entry.depth, entry.move, entry.score)
+                hint = entry.move
+        result = self.executor.submit(search_worker, pos, list(hist), budget, hint).result()
+        if self.cache is not None and result is not None and result[1] is not None:
+            with self.lock:
+                self.cache.put(pos, result[1], result[2], result[0])
+                self.changed = True
+        return result
+
+    def save(self):
+        """Writes the cache to disk if it changed; only copying the entries holds up the searches."""
+        with self.lock:
+            if not self.changed:
+                return
+            entries = list(self.cache.entries.items())
+            self.changed = False
+        self.cache.save(entries)
+
+    def saveLoop(self, interval):
+        while not self.stopped.wait(interval):
+            self.save()
+
+    def shutdown(self):
+        self.executor.shutdown()
+        if self.saver is not None:
+            self.stopped.set()
+            self.saver.join()
+            self.save()
+
+
+class Board:
+
+    def __init__(self, config, engine, analysis, budget=1):
+        """One chess board with its own camera and printer.
+
+        config -- dict with 'name', 'stream', 'host', 'api_key' and optionally 'home' (bool),
+                  'games' (how many games to play, default 1) and 'octoprint' (more arguments for Octoprint)
+        engine -- the shared EnginePool
+        analysis -- the shared executor for frame analysis
+        budget -- how long to search in seconds
+        """
+        self.config = config
+        self.name = config.get('name', config['stream'])
+        self.engine = engine
+        self.analysis = analysis
+        self.budget = budget
+        self.timings = []
+        self.error = None
+        self.thread = threading.Thread(target=self.run, name=self.name, daemon=True)
+
+    def run(self):
+        """Plays the board's games; runs on the board's own thread so that its phases never wait for other boards."""
+        md = None
+        q = None
+        try:
+            md = MoveDetector(self.config['stream'], executor=self.analysis)
+            o = Octoprint(host=self.config['host'], api_key=self.config.get('api_key', ''), wait='poll',
+                          **self.config.get('octoprint', {}))
+            q = MotionQueue(o)
+            if self.config.get('home', False):
+                q.home()
+            q.park()
+            for game in range(self.config.get('games', 1)):
+                print('[%s] game %d' % (self.name, game+1))
+                self.timings += play(md, q, budget=self.budget, search=self.engine.search)
+        except Exception as e:
+            self.error = e
+            print('[%s] stopped: %r' % (self.name, e))
+        finally:
+            if q is not None:
+                q.shutdown()
+            if md is not None:
+                md.close()
+
+
+'''
+Runs all boards of a config file at once and waits until all their games are over
+'''
+def serve(config):
+    cache = PositionCache(config['cache']) if config.get('cache') else None
+    engine = EnginePool(config.get('engine_workers'), cache)
+    analysis = ThreadPoolExecutor(config.get('analysis_workers') or os.cpu_count())
+    boards = [Board(board, engine, analysis, config.get('budget', 1)) for board in config['boards']]
+    try:
+        for board in boards:
+            board.thread.start()
+        for board in boards:
+            board.thread.join()
+    finally:
+        analysis.shutdown()
+        engine.shutdown()
+    return boards
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Plays on many boards (printers and cameras) from one process.')
+    parser.add_argument('config', help='''JSON file like {"boards": [{"name": "left", "stream": "http://...", "host": "http://...", "api_key": "..."}, ...],
+                        "engine_workers": 4, "analysis_workers": 4, "budget": 1, "cache": "positions.bin"}''')
+    args = parser.parse_args()
+
+    with open(args.config) as f:
+        boards = serve(json.load(f))
+    for board in boards:
+        print('%s: %d turns%s' % (board.name, len(board.timings), ', failed: %r' % board.error if board.error else ''))
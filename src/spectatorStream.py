@@ -0,0 +1,195 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import cv2
+
+
+BOUNDARY = 'spectatorframe'
+
+
+class SpectatorStream:
+
+    '''
+    Serves the MoveDetector's camera frames to any number of local viewers as an MJPEG stream,
+    so that spectators don't open more connections to the webcam.
+    The frames are taken from the detector's FrameGrabber without consuming them. Every frame gets
+    its overlays (the board outline, the squares and the last recognized move) and is encoded
+    once, at most fps times per second and only while someone is watching; all viewers get the same bytes.
+    Every viewer has its own thread and always gets the newest frame once its connection took the
+    previous one, so slow viewers get fewer frames without holding up the others.
+    Viewers can ask for fewer frames with ?fps=n
+
+    md -- the MoveDetector whose capture is shared
+    port -- the port to listen on (0 picks a free one)
+    fps -- how many frames per second are rendered at most
+    quality -- JPEG quality of the served frames
+    '''
+    def __init__(self, md, port=8090, host='', fps=10, quality=70):
+        self.md = md
+        self.fps = fps
+        self.quality = quality
+        self.condition = threading.Condition()
+        self.jpeg = None
+        self.seq = 0
+        self.viewers = 0
+        self.running = False
+        self.thread = None
+
+        stream = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                stream.handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.url = 'http://%s:%d' % (host or '127.0.0.1', self.server.server_address[1])
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.running = False
+        with self.condition:
+            self.condition.notify_all()
+        self.server.shutdown()
+        self.server.server_close()
+        if self.thread is not None:
+            self.thread.join()
+
+    '''
+    Render loop: draws and encodes the newest frame while there are viewers
+    '''
+    def run(self):
+        after = 0
+        while self.running:
+            with self.condition:
+                while self.running and self.viewers == 0:
+                    self.condition.wait()
+            started = time.time()
+            frame = self.md.grabber.peek(after, timeout=1)
+            if frame is None:
+                if self.md.grabber.ended:
+                    break
+                continue
+            after = frame.seq
+            if frame.image is None:
+                continue
+            ok, data = cv2.imencode('.jpg', self.annotate(frame.image), (cv2.IMWRITE_JPEG_QUALITY, self.quality))
+            if ok:
+                with self.condition:
+                    self.jpeg = data.tobytes()
+                    self.seq += 1
+                    self.condition.notify_all()
+            delay = 1/self.fps - (time.time() - started)
+            if delay > 0:
+                time.sleep(delay)
+
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+
+    '''
+    Returns a copy of the frame with the board outline, the squares and the last recognized move drawn on it
+    '''
+    def annotate(self, image):
+        image = image.copy()
+        md = self.md
+        corners = getattr(md, 'corners', None)
+        if corners is not None:
+            (ul, ur, ll, lr) = np.int32(corners)
+            cv2.polylines(image, [np.array([ul, ur, lr, ll])], True, (0, 200, 255), 1, cv2.LINE_AA)
+        positions = getattr(md, 'fieldPositions', {})
+        for point in positions.values():
+            cv2.circle(image, (int(point[0]), int(point[1])), 2, (255, 200, 0), -1)
+        move = md.lastMove
+        if move is not None and move[:2] in positions and move[2:4] in positions:
+            start = tuple(int(v) for v in positions[move[:2]])
+            end = tuple(int(v) for v in positions[move[2:4]])
+            cv2.arrowedLine(image, start, end, (0, 0, 255), 2, cv2.LINE_AA, tipLength=0.2)
+            cv2.putText(image, move, (5, image.shape[0]-8), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 1, cv2.LINE_AA)
+        return image
+
+    '''
+    Waits for a frame newer than seq, returns (seq, jpeg) or None if the stream stopped
+    '''
+    def waitFrame(self, seq, timeout=5):
+        with self.condition:
+            deadline = time.time() + timeout
+            while self.running and self.seq <= seq:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                self.condition.wait(remaining)
+            if not self.running:
+                return None
+            return self.seq, self.jpeg
+
+    '''
+    Serves /stream (MJPEG) and /snapshot.jpg to one viewer
+    '''
+    def handle(self, request):
+        url = urlparse(request.path)
+        if url.path not in ('/', '/stream', '/snapshot.jpg'):
+            request.send_error(404)
+            return
+        with self.condition:
+            self.viewers += 1
+            self.condition.notify_all()
+        try:
+            if url.path == '/snapshot.jpg':
+                self.sendSnapshot(request)
+            else:
+                fps = float(parse_qs(url.query).get('fps', [self.fps])[0])
+                self.sendStream(request, min(max(fps, 0.1), self.fps))
+        except (OSError, ValueError):
+            #the viewer went away
+            pass
+        finally:
+            with self.condition:
+                self.viewers -= 1
+
+    def sendSnapshot(self, request):
+        frame = self.waitFrame(0)
+        if frame is None:
+            request.send_error(503)
+            return
+        request.send_response(200)
+        request.send_header('Content-Type', 'image/jpeg')
+        request.send_header('Content-Length', str(len(frame[1])))
+        request.end_headers()
+        request.wfile.write(frame[1])
+
+    def sendStream(self, request, fps):
+        request.send_response(200)
+        request.send_header('Content-Type', 'multipart/x-mixed-replace; boundary=' + BOUNDARY)
+        request.send_header('Cache-Control', 'no-cache')
+        request.end_headers()
+        seq = 0
+        while self.running:
+            started = time.time()
+            frame = self.waitFrame(seq)
+            if frame is None:
+                if not self.running:
+                    break
+                continue
+            seq, jpeg = frame
+            #blocks while the viewer's connection is full, frames rendered meanwhile are skipped
+            request.wfile.write(b'--%s\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n' % (BOUNDARY.encode(), len(jpeg)))
+            request.wfile.write(jpeg)
+            request.wfile.write(b'\r\n')
+            request.wfile.flush()
+            delay = 1/fps - (time.time() - started)
+            if delay > 0:
+                time.sleep(delay)
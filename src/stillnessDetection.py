@@ -0,0 +1,120 @@
+import numpy as np
+import cv2
+from noiseModel import NoiseModel
+
+
+class StillnessDetector:
+
+    '''
+    Decides whether there is movement on the chess board
+    Only looks at the board, warped onto a small grayscale grid of 8x8 cells, and measures
+    the mean absolute difference of the inner part of every cell since the last analyzed frame.
+    A frame shows movement if at least minSquares squares changed more than their noise threshold,
+    which the NoiseModel derives from the frames without movement seen so far.
+    A change of the whole board (e.g. the camera adjusting its exposure) is not counted as movement.
+    The board counts as settled once there was no movement for settleTime seconds.
+    It counts as calm once there was no movement on at least calmFrames analyzed frames over calmTime seconds
+    (by default a third of settleTime), which is when a move may be recognized early.
+    Needs the perspective transform of the board (see MoveDetector.calcTransform) and the size of its cells
+    '''
+    def __init__(self, transform, cellSize=16, cellMargin=4, size=8, settleTime=0.3, minSquares=1, noise=None,
+                 calmTime=None, calmFrames=2):
+        self.cellSize = cellSize
+        self.size = size
+        self.setTransform(transform)
+        self.margin = max(1, cellMargin*size//cellSize)
+        self.settleTime = settleTime
+        self.calmTime = settleTime/3 if calmTime is None else calmTime
+        self.calmFrames = calmFrames
+        self.minSquares = minSquares
+        self.noise = noise if noise is not None else NoiseModel()
+        self.prev = None
+        self.lastMotion = None
+        self.hasMoved = False
+        #analyzed frames without movement since the last one with movement
+        self.stillFrames = 0
+
+    '''
+    Uses a new perspective transform of the board, e.g. after the camera moved
+    '''
+    def setTransform(self, transform):
+        #the transform is scaled so that every cell becomes size x size pixels
+        scale = np.diag([self.size/self.cellSize, self.size/self.cellSize, 1.0])
+        self.transform = scale.dot(transform)
+
+    '''
+    Returns the inner part of every cell of the grayscale board of a frame as an (8,c,8,c) array
+    '''
+    def thumbnail(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        c, m = self.size, self.margin
+        board = cv2.warpPerspective(gray, self.transform, (8*c, 8*c))
+        return board.reshape(8, c, 8, c)[:, m:c-m, :, m:c-m]
+
+    '''
+    Returns the mean absolute difference of every square between two thumbnails as an (8,8) array
+    '''
+    def squareDiff(self, thumb, prev):
+        return cv2.absdiff(thumb, prev).mean(axis=(1,3))
+
+    '''
+    Returns the squares (8,8) whose difference is not explained by noise
+    The median excess over all squares is removed first, so that changes of the whole board don't count
+    '''
+    def changedSquares(self, diff):
+        excess = self.noise.score(diff)
+        return excess - max(np.median(excess), 0) > self.noise.sigmas
+
+    '''
+    Seeds the noise model with consecutive frames without movement
+    '''
+    def calibrate(self, frames):
+        thumbs = [self.thumbnail(frame) for frame in frames]
+        for (a, b) in zip(thumbs, thumbs[1:]):
+            self.noise.update(self.squareDiff(b, a))
+
+    '''
+    Starts a new observation with the given frame as reference
+    '''
+    def reset(self, frame, timestamp):
+        self.prev = self.thumbnail(frame)
+        self.lastMotion = timestamp
+        self.hasMoved = False
+        self.stillFrames = 0
+
+    '''
+    Analyzes a frame, returns whether it shows movement
+    Frames without movement update the noise model
+    '''
+    def update(self, frame, timestamp):
+        thumb = self.thumbnail(frame)
+        diff = self.squareDiff(thumb, self.prev)
+        moving = np.count_nonzero(self.changedSquares(diff)) >= self.minSquares
+        if moving:
+            self.lastMotion = timestamp
+            self.hasMoved = True
+            self.stillFrames = 0
+        else:
+            self.noise.update(diff)
+            self.stillFrames += 1
+        self.prev = thumb
+        return moving
+
+    '''
+    Returns whether there was no movement for at least settleTime seconds
+    '''
+    def still(self, timestamp):
+        return timestamp - self.lastMotion >= self.settleTime
+
+    '''
+    Returns whether there has been movement that stopped at least calmTime seconds and calmFrames analyzed frames ago
+    A hand that pauses for a single frame (e.g. while it lifts a piece) doesn't make the board calm
+    '''
+    def calm(self, timestamp):
+        return self.hasMoved and self.stillFrames >= self.calmFrames and timestamp - self.lastMotion >= self.calmTime
+
+    '''
+    Returns whether there has been movement that stopped at least settleTime seconds ago
+    '''
+    def settled(self, timestamp):
+        return self.hasMoved and timestamp - self.lastMotion >= self.settleTime
@@ -0,0 +1,172 @@
+import numpy as np
+import cv2
+
+
+#colors (BGR) of the printed chess set, the board and the table
+WHITE_PIECE = (60, 170, 60)
+BLACK_PIECE = (40, 130, 230)
+LIGHT_SQUARE = (225, 225, 225)
+DARK_SQUARE = (35, 35, 35)
+TABLE = (120, 110, 100)
+SKIN = (120, 150, 210)
+
+FILES = 'abcdefgh'
+
+
+'''
+Returns the pieces of the starting position as a dict of square names and (color, kind), e.g. {'e2': ('w', 'p')}
+'''
+def initialPieces():
+    pieces = {}
+    for fil, kind in zip(FILES, 'rnbqkbnr'):
+        pieces[fil+'1'], pieces[fil+'2'] = ('w', kind), ('w', 'p')
+        pieces[fil+'7'], pieces[fil+'8'] = ('b', 'p'), ('b', kind)
+    return pieces
+
+
+'''
+Applies a move like e2e4 to a dict of pieces (captures, castling and en passant included), returns the new dict
+'''
+def applyMove(pieces, move):
+    pieces = dict(pieces)
+    start, end = move[:2], move[2:4]
+    piece = pieces.pop(start)
+    if piece[1] == 'p' and start[0] != end[0] and end not in pieces:
+        #en passant: the captured pawn is next to the start square
+        pieces.pop(end[0]+start[1], None)
+    if piece[1] == 'k' and abs(FILES.index(end[0]) - FILES.index(start[0])) == 2:
+        #castling: the rook jumps over the king
+        rook, target = ('h', 'f') if end[0] == 'g' else ('a', 'd')
+        pieces[target+end[1]] = pieces.pop(rook+end[1])
+    pieces[end] = piece
+    return pieces
+
+
+class SyntheticBoard:
+
+    '''
+    Renders camera frames of a chess board for benchmarks without a camera.
+    The board is drawn from above (A1 top right, H8 bottom left, like the real setup), then warped into the
+    camera image with a random skew of its corners. Every frame gets a lighting gradient, a slowly drifting
+    brightness and gaussian pixel noise. A hand can be drawn that reaches in from the bottom of the image.
+    The true corners of the board in the image (upper left, upper right, lower left, lower right) are in self.corners.
+    '''
+    def __init__(self, width=640, height=480, skew=0.03, noise=3.0, lighting=0.25, fill=0.8, seed=0):
+        self.width = width
+        self.height = height
+        self.noise = noise
+        self.lighting = lighting
+        self.random = np.random.default_rng(seed)
+        self.frames = 0
+
+        #the board is drawn at this many pixels per square, then warped into the camera image
+        self.squareSize = max(8, int(fill*min(width, height)/8))
+        size = 8*self.squareSize
+        center = np.array([width/2, height/2])
+        square = np.float32([(-1,-1), (1,-1), (-1,1), (1,1)])*size/2
+        self.corners = np.float32(center + square + self.random.uniform(-skew, skew, (4,2))*size)
+        source = np.float32([(0,0), (size,0), (0,size), (size,size)])
+        self.homography = cv2.getPerspectiveTransform(source, self.corners)
+
+        #brighter on one side of the image
+        direction = self.random.uniform(-1, 1, 2)
+        ys, xs = np.mgrid[0:height, 0:width]
+        ramp = (xs/width - 0.5)*direction[0] + (ys/height - 0.5)*direction[1]
+        self.gradient = (1 + lighting*ramp)[:, :, None].astype(np.float32)
+
+    '''
+    Returns the center (x, y) of a square in the top-down drawing
+    Row 0 is rank 1 and column 0 is the h file
+    '''
+    def squareCenter(self, name):
+        row = int(name[1]) - 1
+        col = 7 - FILES.index(name[0])
+        return ((col+0.5)*self.squareSize, (row+0.5)*self.squareSize)
+
+    '''
+    Draws the board and its pieces from above, hand is an (x, y) position in the drawing or None
+    '''
+    def drawBoard(self, pieces, hand=None):
+        s = self.squareSize
+        board = np.empty((8*s, 8*s, 3), np.uint8)
+        for row in range(8):
+            for col in range(8):
+                #A1 (row 0, column 7) is a dark square
+                color = DARK_SQUARE if (row + col) % 2 == 1 else LIGHT_SQUARE
+                board[row*s:(row+1)*s, col*s:(col+1)*s] = color
+        for name, (color, kind) in pieces.items():
+            x, y = self.squareCenter(name)
+            radius = int(s*(0.28 if kind == 'p' else 0.36))
+            cv2.circle(board, (int(x), int(y)), radius, WHITE_PIECE if color == 'w' else BLACK_PIECE, -1, cv2.LINE_AA)
+            cv2.circle(board, (int(x), int(y)), radius, (20, 20, 20), max(1, s//20), cv2.LINE_AA)
+        if hand is not None:
+            x, y = int(hand[0]), int(hand[1])
+            cv2.line(board, (x, y), (x + s, 12*s), SKIN, int(0.8*s), cv2.LINE_AA)
+            cv2.ellipse(board, (x, y), (int(0.6*s), int(0.45*s)), 20, 0, 360, SKIN, -1, cv2.LINE_AA)
+        return board
+
+    '''
+    Returns one camera frame of the given pieces (and hand)
+    '''
+    def render(self, pieces, hand=None):
+        image = np.empty((self.height, self.width, 3), np.uint8)
+        image[:] = TABLE
+        cv2.warpPerspective(self.drawBoard(pieces, hand), self.homography, (self.width, self.height),
+                            image, flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_TRANSPARENT)
+
+        #lighting and sensor noise
+        self.frames += 1
+        drift = 1 + 0.05*self.lighting*np.sin(self.frames/90)
+        light = image.astype(np.float32)*self.gradient*drift
+        light += self.random.normal(0, self.noise, light.shape).astype(np.float32)
+        return np.clip(light, 0, 255).astype(np.uint8)
+
+    '''
+    Generates the frames of a scripted game: still frames of the starting position, then for every move
+    a hand that reaches for the piece, carries it to its target square and leaves, followed by still frames.
+    Frames are rendered when they are needed, so long scripts at high resolutions fit into memory
+    '''
+    def script(self, moves, still=30, reach=8, carry=8):
+        pieces = initialPieces()
+        for _ in range(still):
+            yield self.render(pieces)
+        outside = np.array((4*self.squareSize, 10*self.squareSize))
+        for move in moves:
+            start = np.array(self.squareCenter(move[:2]))
+            end = np.array(self.squareCenter(move[2:4]))
+            lifted = {name: piece for name, piece in pieces.items() if name != move[:2]}
+            for t in np.linspace(0, 1, reach):
+                yield self.render(pieces, outside + t*(start - outside))
+            for t in np.linspace(0, 1, carry):
+                yield self.render(lifted, start + t*(end - start))
+            pieces = applyMove(pieces, move)
+            for t in np.linspace(0, 1, reach):
+                yield self.render(pieces, end + t*(outside - end))
+            for _ in range(still):
+                yield self.render(pieces)
+
+
+class SyntheticSource:
+
+    '''
+    A cv2.VideoCapture-like source that plays frames (any iterable) at fps, with virtual time,
+    so that MoveDetector's settle window works without waiting in real time
+    '''
+    def __init__(self, frames, fps=30):
+        self.frames = iter(frames)
+        self.fps = fps
+        self.index = 0
+
+    def read(self):
+        frame = next(self.frames, None)
+        if frame is None:
+            return False, None
+        self.index += 1
+        return True, frame
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_POS_MSEC:
+            return 1000*self.index/self.fps
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        return 0
@@ -0,0 +1,65 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import metrics
+
+
+class Transport:
+
+    def __init__(self, host, api_key='', timeout=(3.05, 10), retries=3, backoff=0.2):
+        """Create a persistent HTTP session to an Octoprint instance.
+
+        host -- The URL of your Octoprint instance.
+        api_key -- Your Octoprint API key.
+        timeout -- (connect, read) timeout in seconds for every request.
+        retries -- how often to retry a request that could not be delivered.
+        backoff -- backoff factor in seconds between retries.
+        """
+        self.base_url = host.rstrip('/')
+        self.timeout = timeout
+        self.round_trips = 0
+
+        #only retry if the request never reached Octoprint (or it was temporarily unavailable),
+        #a repeated jog must never be executed twice
+        retry = Retry(total=retries, connect=retries, read=0, status=retries,
+                      status_forcelist=(503,), allowed_methods=None,
+                      backoff_factor=backoff, raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        #the content type is set per request, file uploads need multipart instead of json
+        self.session.headers.update({'X-Api-Key': api_key})
+
+    def request(self, method, path, **kwargs):
+        """Sends a single request over the keep-alive session and returns the response."""
+        kwargs.setdefault('timeout', self.timeout)
+        self.round_trips += 1
+        with metrics.span('octoprint_request', method=method, path=path):
+            r = self.session.request(method, self.base_url + path, **kwargs)
+        r.raise_for_status()
+        return r
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, json=None, **kwargs):
+        return self.request('POST', path, json=json, **kwargs)
+
+    def command(self, gcode):
+        """Sends a list of g-code lines to the printer in a single request."""
+        return self.post('/api/printer/command', json={'commands': list(gcode)})
+
+    def upload(self, name, gcode, start=True):
+        """Uploads a list of g-code lines as a file to Octoprint's local storage and, if start is set, prints it right away."""
+        data = ('\n'.join(gcode) + '\n').encode()
+        form = {'select': 'true', 'print': 'true' if start else 'false'}
+        return self.post('/api/files/local', files={'file': (name, data, 'application/octet-stream')}, data=form)
+
+    def job(self):
+        """Returns the current job information as reported by /api/job."""
+        return self.get('/api/job').json()
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,126 @@
+import argparse
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import cv2
+from sunfish import Position, initial, parse
+
+from moveDetection import MoveDetector
+from syntheticBoard import SyntheticBoard, SyntheticSource, initialPieces
+
+
+'''
+Returns the mean and the worst time of fn(*args) in ms over repeats calls,
+and how many KiB the call allocates at its peak (numpy and OpenCV arrays included)
+'''
+def measure(fn, *args, repeats=20):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        fn(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return 1000*np.mean(times), 1000*max(times), peak/1024
+
+
+'''
+Plays a scripted game on the detector and returns (moves recognized correctly, ms per analyzed frame)
+'''
+def playScript(md, moves):
+    pos = Position(initial, 0, (True,True), (True,True), 0, 0)
+    correct = 0
+    seq = md.seq
+    start = time.perf_counter()
+    for ply, expected in enumerate(moves):
+        white = ply % 2 == 0
+        name = md.getMove(pos, flipped=not white)
+        if name is None:
+            break
+        if name == expected:
+            correct += 1
+        else:
+            print('  expected %s, recognized %s' % (expected, name))
+            expected = name
+        move = parse(expected[:2]), parse(expected[2:4])
+        if not white:
+            move = 119-move[0], 119-move[1]
+        pos = pos.move(move)
+    frames = max(1, (md.seq - seq)//md.stride)
+    return correct, 1000*(time.perf_counter() - start)/frames
+
+
+'''
+Benchmarks every vision stage on synthetic frames of one camera resolution
+Returns (rows of (stage, mean ms, max ms, KiB), corner error in px, moves recognized correctly)
+'''
+def run(width, height, moves, seed=0, skew=0.03, noise=3.0, repeats=20):
+    board = SyntheticBoard(width, height, skew=skew, noise=noise, seed=seed)
+    md = MoveDetector(SyntheticSource(board.script(moves, still=40)), drop=False)
+    rows = []
+    try:
+        raw = board.render(initialPieces())
+        rows.append(('resize', *measure(md.grabber.prepare, raw, repeats=repeats)))
+        frame = md.grabber.prepare(raw)
+
+        rows.append(('detectSquares', *measure(md.detectSquares, frame, repeats=repeats)))
+        #the stored corners are in the coordinates of the resized frame, where pixel centers are shifted by resizing
+        scale = md.grabber.resize
+        error = np.abs(md.corners - ((board.corners + 0.5)*scale - 0.5)).max()
+
+        edges = cv2.Canny(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), 150, 200)
+        rows.append(('houghLines', *measure(md.houghLines, edges, (0.45*np.pi, 0.55*np.pi), repeats=repeats)))
+        lines = md.houghLines(edges, (0.45*np.pi, 0.55*np.pi))
+        rows.append(('getCoords', *measure(md.getCoords, lines, repeats=repeats)))
+        coords = md.getCoords(lines)
+        vertical = md.getCoords(md.houghLines(edges, (0, 0.05*np.pi)))
+        if coords and vertical:
+            rows.append(('getIntersection', *measure(md.getIntersection, coords[0], vertical[0], repeats=repeats)))
+
+        rows.append(('warpBoard', *measure(md.warpBoard, frame, repeats=repeats)))
+        #measuring feeds the same frame to the noise model over and over, the learned noise is restored afterwards
+        noise = md.stillness.noise.state()
+        md.stillness.reset(frame, 0)
+        rows.append(('stillness', *measure(md.stillness.update, frame, 0, repeats=repeats)))
+        md.stillness.noise.load(noise)
+        pos = Position(initial, 0, (True,True), (True,True), 0, 0)
+        lastBoard = md.warpBoard(frame)
+        rows.append(('classify', *measure(md.classify, pos, frame, lastBoard, md.margin, repeats=repeats)))
+
+        correct, perFrame = playScript(md, moves)
+        rows.append(('getMove/frame', perFrame, perFrame, 0))
+    finally:
+        md.close()
+    return rows, error, correct
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks the vision stages on synthetic board frames and checks their accuracy.')
+    parser.add_argument('--resolutions', nargs='+', default=['640x480', '1280x720', '1920x1080'], help='camera resolutions like 640x480')
+    parser.add_argument('--moves', default='e2e4 e7e5 g1f3 b8c6 f1c4 g8f6 e1g1', help='scripted moves (both players)')
+    parser.add_argument('--skew', type=float, default=0.03, help='random offset of the board corners, relative to the board size')
+    parser.add_argument('--noise', type=float, default=3.0, help='standard deviation of the pixel noise')
+    parser.add_argument('--repeats', type=int, default=20, help='calls per stage')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--check', action='store_true', help='exit with an error if a corner is off by more than --max-error px or a move is not recognized')
+    parser.add_argument('--max-error', type=float, default=2.0)
+    args = parser.parse_args()
+
+    moves = args.moves.split()
+    failed = False
+    for resolution in args.resolutions:
+        width, height = (int(v) for v in resolution.split('x'))
+        rows, error, correct = run(width, height, moves, args.seed, args.skew, args.noise, args.repeats)
+        print('%s: corner error %.1f px, %d/%d moves recognized' % (resolution, error, correct, len(moves)))
+        print('  %-16s %9s %9s %9s' % ('stage', 'mean ms', 'max ms', 'KiB'))
+        for stage, mean, worst, kib in rows:
+            print('  %-16s %9.3f %9.3f %9.1f' % (stage, mean, worst, kib))
+        failed = failed or error > args.max_error or correct < len(moves)
+    if args.check and failed:
+        sys.exit(1)
@@ -0,0 +1,75 @@
+import pytest
+
+sunfish = pytest.importorskip('sunfish')
+
+import engine
+from engine import InterruptibleSearcher, ParallelSearcher, bisect, split_worker, think
+
+
+def play(moves):
+    hist = [sunfish.Position(sunfish.initial, 0, (True,True), (True,True), 0, 0)]
+    for ply, smove in enumerate(moves.split()):
+        move = sunfish.parse(smove[:2]), sunfish.parse(smove[2:4])
+        if ply % 2:
+            move = 119-move[0], 119-move[1]
+        hist.append(hist[-1].move(move))
+    return hist
+
+
+#scholar's mate: Qxf7# is white's only mate
+MATE_IN_ONE = 'e2e4 e7e5 f1c4 b8c6 d1h5 g8f6'
+MATE = (sunfish.parse('h5'), sunfish.parse('f7'))
+
+
+@pytest.fixture(scope='module')
+def parallel():
+    parallel = ParallelSearcher(2)
+    yield parallel
+    parallel.shutdown()
+
+
+def test_think_finds_mate():
+    hist = play(MATE_IN_ONE)
+    _depth, move, score = think(InterruptibleSearcher(), hist[-1], hist, 0.5)
+    assert move == MATE
+    assert score >= sunfish.MATE_LOWER
+
+
+def test_parallel_search_finds_mate(parallel):
+    hist = play(MATE_IN_ONE)
+    depth, move, score = parallel.search(hist[-1], hist, 0.5)
+    assert depth >= 2
+    assert move == MATE
+    assert score >= sunfish.MATE_LOWER
+
+
+def test_parallel_search_without_time_returns_a_move(parallel):
+    hist = play('e2e4 e7e5')
+    result = parallel.search(hist[-1], hist, 0)
+    assert result is not None
+    assert result[1] in hist[-1].gen_moves()
+
+
+def test_split_worker_scores_only_better_moves():
+    hist = play('e2e4 e7e5 g1f3 b8c6')
+    pos = hist[-1]
+    for move in list(pos.gen_moves())[:6]:
+        searcher = InterruptibleSearcher()
+        searcher.history = set(hist)
+        score = -bisect(searcher, pos.move(move), 2)
+        #every test starts with a fresh worker, like the search above
+        engine._splitSearcher = None
+        assert split_worker(1, pos, hist, move, 3, score)[0] is None
+        engine._splitSearcher = None
+        better, nodes = split_worker(1, pos, hist, move, 3, score - 100)
+        assert nodes > 0
+        assert abs(better - score) <= sunfish.EVAL_ROUGHNESS
+
+
+def test_parallel_search_agrees_with_think(parallel):
+    hist = play('e2e4 e7e5 g1f3 b8c6 f1c4 g8f6')
+    depth, move, score = parallel.search(hist[-1], hist, 0.5)
+    for think_depth, think_move, think_score in sunfish.Searcher().search(hist[-1], hist):
+        if think_depth == depth:
+            break
+    assert abs(score - think_score) <= 2*sunfish.EVAL_ROUGHNESS
@@ -0,0 +1,34 @@
+import re
+
+import pytest
+
+pytest.importorskip('sunfish')
+cv2 = pytest.importorskip('cv2')
+
+from extractGames import extract
+from syntheticBoard import SyntheticBoard
+
+MOVES = ['e2e4', 'e7e5', 'g1f3', 'b8c6', 'f1c4', 'g8f6', 'e1g1', 'f8c5']
+
+
+@pytest.fixture(scope='module')
+def video(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('videos') / 'game.avi')
+    board = SyntheticBoard(640, 480, seed=0)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 30, (640, 480))
+    for frame in board.script(MOVES, still=40):
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+@pytest.mark.parametrize('stride', [1, 2])
+def test_extract_writes_the_game(video, tmp_path, stride):
+    path, moves, frames, seconds = extract(video, str(tmp_path), stride)
+    assert moves == len(MOVES)
+    with open(tmp_path / 'game.pgn') as f:
+        text = f.read()
+    assert '[Site "game.avi"]' in text
+    movetext = re.sub(r'\{[^}]*\}', '', text.split('\n\n', 1)[1])
+    sans = [word for word in movetext.split() if not re.match(r'\d+\.|\*$', word)]
+    assert sans == ['e4', 'e5', 'Nf3', 'Nc6', 'Bc4', 'Nf6', 'O-O', 'Bc5']
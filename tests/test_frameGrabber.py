@@ -0,0 +1,25 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('cv2')
+
+from frameGrabber import FrameGrabber
+
+
+class CountingSource:
+    '''Endless source of tiny frames'''
+
+    def read(self):
+        return True, np.zeros((4, 4, 3), np.uint8)
+
+
+def test_skipping_more_than_the_buffer_does_not_block_the_producer():
+    grabber = FrameGrabber(CountingSource(), width=4, bufferSize=4, drop=False).start()
+    try:
+        first = grabber.next(0, timeout=2)
+        assert first is not None
+        #skips more frames than fit in the buffer
+        frame = grabber.next(first.seq + 10, timeout=2)
+        assert frame is not None and frame.seq == first.seq + 11
+    finally:
+        grabber.stop()
@@ -0,0 +1,81 @@
+import pytest
+
+sunfish = pytest.importorskip('sunfish')
+
+from journal import Journal, restore
+
+
+def start():
+    return sunfish.Position(sunfish.initial, 0, (True,True), (True,True), 0, 0)
+
+
+def move(name, robot=False):
+    i, j = sunfish.parse(name[:2]), sunfish.parse(name[2:4])
+    #the robot plays black on a rotated board
+    return (119-i, 119-j) if robot else (i, j)
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = Journal(str(tmp_path / 'game.journal'))
+    journal.start(calibration={'camera': {'corners': [[0, 0]]}})
+    yield journal
+    journal.close()
+
+
+def test_round_trip(journal):
+    journal.record('move', side='human', move='e2e4')
+    journal.record('move', side='robot', move='e7e5')
+    journal.record('motion', gantry=[10, 20, 150])
+    state = restore(journal.load())
+    assert state['hist'] == [start(), start().move(move('e2e4')), start().move(move('e2e4')).move(move('e7e5', True))]
+    assert state['info']['calibration'] == {'camera': {'corners': [[0, 0]]}}
+    assert not state['moving']
+    assert state['gantry'] == [10, 20, 150]
+
+
+def test_truncated_last_line_is_ignored(journal):
+    journal.record('move', side='human', move='e2e4')
+    journal.record('move', side='robot', move='e7e5')
+    journal.close()
+    with open(journal.path, 'a') as f:
+        f.write('{"event": "motion", "gan')
+    events = journal.load()
+    assert [e['event'] for e in events] == ['game', 'move', 'move']
+    assert len(restore(events)['hist']) == 3
+
+
+def test_robot_move_without_motion_is_moving(journal):
+    journal.record('move', side='human', move='e2e4')
+    journal.record('move', side='robot', move='e7e5')
+    state = restore(journal.load())
+    assert state['moving']
+    assert state['gantry'] is None
+
+
+def test_side_to_move_after_resume(journal):
+    #main.play lets the robot move first if the history has an even number of positions
+    journal.record('move', side='human', move='e2e4')
+    assert len(restore(journal.load())['hist']) % 2 == 0
+    journal.record('move', side='robot', move='e7e5')
+    journal.record('motion', gantry=[10, 20, 150])
+    assert len(restore(journal.load())['hist']) % 2 == 1
+
+
+def test_resume_appends_to_the_journal(journal):
+    journal.record('move', side='human', move='e2e4')
+    journal.close()
+    journal.resume()
+    journal.record('move', side='robot', move='e7e5')
+    assert len(restore(journal.load())['hist']) == 3
+
+
+def test_finished_game_is_not_restored(journal):
+    journal.record('move', side='human', move='e2e4')
+    journal.record('end', result='1-0')
+    assert restore(journal.load()) is None
+
+
+def test_no_game(tmp_path):
+    assert Journal(str(tmp_path / 'missing.journal')).load() == []
+    assert restore([]) is None
@@ -0,0 +1,19 @@
+import metrics
+
+
+def test_toggle_does_not_take_the_lock(tmp_path):
+    trace = tmp_path / 'trace.jsonl'
+    metrics.enable(str(trace))
+    try:
+        #a signal that arrives while the main thread records an event
+        with metrics._lock:
+            metrics.toggle()
+        assert not metrics.enabled
+        metrics.count('ignored')
+        with metrics._lock:
+            metrics.toggle()
+        metrics.count('recorded')
+    finally:
+        metrics.disable()
+    lines = trace.read_text().splitlines()
+    assert len(lines) == 1 and '"recorded"' in lines[0]
@@ -0,0 +1,65 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+cv2 = pytest.importorskip('cv2')
+np = pytest.importorskip('numpy')
+
+from frameGrabber import FrameGrabber
+from mjpegStream import MjpegStream
+
+
+class StallingStream(BaseHTTPRequestHandler):
+
+    #serves one frame, then stops sending without closing the connection
+    def do_GET(self):
+        ok, jpeg = cv2.imencode('.jpg', np.zeros((48, 64, 3), np.uint8))
+        data = jpeg.tobytes()
+        self.send_response(200)
+        self.send_header('Content-Type', 'multipart/x-mixed-replace; boundary=frame')
+        self.end_headers()
+        self.wfile.write(b'--frame\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n' % len(data) + data + b'\r\n')
+        self.wfile.flush()
+        time.sleep(2)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StallingStream)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield 'http://127.0.0.1:%d/' % server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+def test_stalled_stream_ends_the_frame(url):
+    stream = MjpegStream(url, timeout=(1, 0.2))
+    try:
+        assert stream.decode(stream.grab()).shape == (48, 64, 3)
+        #urllib3 raises ReadTimeoutError, which is no OSError
+        assert stream.grab() is None
+    finally:
+        stream.release()
+
+
+class BrokenSource:
+
+    def read(self):
+        raise RuntimeError('camera unplugged')
+
+
+#the capture thread dies of the error, which pytest reports
+@pytest.mark.filterwarnings('ignore::pytest.PytestUnhandledThreadExceptionWarning')
+def test_grabber_ends_when_its_thread_fails():
+    grabber = FrameGrabber(BrokenSource()).start()
+    try:
+        assert grabber.next(0, timeout=2) is None
+        assert grabber.ended
+    finally:
+        grabber.stop()
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+sunfish = pytest.importorskip('sunfish')
+pytest.importorskip('cv2')
+
+from moveDetection import MoveDetector
+from syntheticBoard import SyntheticBoard, SyntheticSource
+
+
+def initial():
+    return sunfish.Position(sunfish.initial, 0, (True,True), (True,True), 0, 0)
+
+
+def detector(moves, **kwargs):
+    board = SyntheticBoard(640, 480, seed=0)
+    return MoveDetector(SyntheticSource(board.script(moves, still=40)), drop=False, **kwargs)
+
+
+def test_knight_move_sharing_its_target_square():
+    #f2f3 also ends on f3, only the knight's move explains the change on g1
+    md = detector(['g1f3'])
+    try:
+        assert md.getMove(initial()) == 'g1f3'
+    finally:
+        md.close()
+
+
+def test_match_move_margin_is_relative():
+    md = detector([])
+    try:
+        #the changes of g1f3 on the synthetic board: the target square changes much more than the start square
+        change = np.full((8, 8), 2.0)
+        change[md.cell(sunfish.parse('f3'))] = 133
+        change[md.cell(sunfish.parse('g1'))] = 49
+        move = md.matchMove(initial(), change, md.margin)
+        assert move == (sunfish.parse('g1'), sunfish.parse('f3'))
+        #without the start square, the target square alone is ambiguous
+        change[md.cell(sunfish.parse('g1'))] = 2
+        assert md.matchMove(initial(), change, md.margin) is None
+    finally:
+        md.close()
+
+
+def test_every_frame_analyzed():
+    #the hand pauses for a frame while it lifts a piece, which must not be taken for the end of the move
+    moves = ['e2e4', 'e7e5', 'g1f3']
+    md = detector(moves, stride=1)
+    try:
+        pos = initial()
+        for ply, expected in enumerate(moves):
+            white = ply % 2 == 0
+            assert md.getMove(pos, flipped=not white) == expected
+            move = sunfish.parse(expected[:2]), sunfish.parse(expected[2:4])
+            pos = pos.move(move if white else (119-move[0], 119-move[1]))
+    finally:
+        md.close()
+
+
+def test_strict_match_ignores_moves_with_unexplained_changes():
+    md = detector([])
+    try:
+        change = np.full((8, 8), 2.0)
+        change[md.cell(sunfish.parse('e2'))] = 120
+        change[md.cell(sunfish.parse('e4'))] = 120
+        assert md.matchMove(initial(), change, md.margin, strict=True) == (sunfish.parse('e2'), sunfish.parse('e4'))
+        #the arm of the hand is still over the board
+        change[md.cell(sunfish.parse('d3'))] = 60
+        assert md.matchMove(initial(), change, md.margin) is not None
+        assert md.matchMove(initial(), change, md.margin, strict=True) is None
+    finally:
+        md.close()
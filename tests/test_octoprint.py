@@ -0,0 +1,49 @@
+import pytest
+
+from mockOctoprint import MockOctoprint
+from octoprint import Octoprint
+
+
+@pytest.fixture
+def mock():
+    mock = MockOctoprint().start()
+    yield mock
+    mock.stop()
+
+
+def test_every_action_is_one_request(mock):
+    o = Octoprint(host=mock.url, sleep=False, wait='sleep')
+    mock.reset()
+    o.remove(4, 4)
+    o.from_to(1, 1, 4, 4)
+    o.park()
+    assert mock.round_trips == 3
+    assert o.transport.round_trips == 3
+    #all requests go over the pooled keep-alive connection
+    assert mock.connections == 1
+    assert len(mock.commands) > 3
+
+
+def test_poll_mode_uploads_every_action_once(mock):
+    o = Octoprint(host=mock.url, sleep=False, wait='poll', poll_interval=0.01)
+    mock.reset()
+    o.from_to(1, 1, 4, 4)
+    #one upload, then polls until the job is done
+    polls = o.transport.round_trips - 1
+    assert mock.round_trips == 1 + polls
+    assert polls >= 1
+    assert mock.commands[-1] == 'M400'
+
+
+def test_robot_move_is_one_request(mock):
+    sunfish = pytest.importorskip('sunfish')
+    o = Octoprint(host=mock.url, sleep=False, wait='sleep')
+    pos = sunfish.Position(sunfish.initial, 0, (True,True), (True,True), 0, 0)
+    #after 1. e4 d5 2. exd5 the robot (black, on a rotated board) recaptures with the queen
+    for ply, move in enumerate(('e2e4', 'd7d5', 'e4d5')):
+        i, j = sunfish.parse(move[:2]), sunfish.parse(move[2:4])
+        pos = pos.move((119-i, 119-j) if ply % 2 else (i, j))
+    mock.reset()
+    o.play_move(pos, (119-sunfish.parse('d8'), 119-sunfish.parse('d5')))
+    assert mock.round_trips == 1
+    assert mock.connections == 1
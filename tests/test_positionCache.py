@@ -0,0 +1,75 @@
+from collections import namedtuple
+
+import pytest
+
+from positionCache import HEADER, MAGIC, VERSION, PositionCache
+
+#the cache only reads these fields of a sunfish Position
+Position = namedtuple('Position', 'board wc bc ep kp')
+
+
+def position(i):
+    return Position('board %d' % i, (True, True), (True, False), 0, i)
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'positions.bin')
+
+
+def test_save_and_load(path):
+    cache = PositionCache(path)
+    cache.put(position(1), (85, 65), 40, 7)
+    cache.put(position(2), (97, 76), -12, 300, book=True)
+    cache.put(position(3), (84, 64), 0, 3)
+    cache.get(position(1))
+    cache.save()
+
+    loaded = PositionCache(path)
+    assert loaded.entries == cache.entries
+    assert list(loaded.entries) == list(cache.entries)
+    assert loaded.get(position(2)) == ((97, 76), -12, 255, True)
+    assert loaded.get(position(4)) is None
+
+
+def test_eviction_keeps_book_entries(path):
+    cache = PositionCache(path, max_entries=3)
+    cache.put(position(0), (85, 65), 0, 1, book=True)
+    cache.put(position(1), (85, 65), 0, 1, book=True)
+    for i in range(2, 6):
+        cache.put(position(i), (85, 65), 0, 1)
+    assert len(cache.entries) == 3
+    assert cache.get(position(0)).book and cache.get(position(1)).book
+    assert cache.get(position(5)) is not None
+
+    #a book that doesn't fit is kept anyway
+    for i in range(6, 9):
+        cache.put(position(i), (85, 65), 0, 1, book=True)
+    assert all(cache.get(position(i)) is not None for i in (0, 1, 6, 7, 8))
+    assert cache.get(position(5)) is None
+
+
+def test_book_and_deeper_entries_are_not_replaced(path):
+    cache = PositionCache(path)
+    cache.put(position(1), (85, 65), 10, 5, book=True)
+    cache.put(position(1), (84, 64), 20, 9)
+    assert cache.get(position(1)) == ((85, 65), 10, 5, True)
+    cache.put(position(2), (85, 65), 10, 5)
+    cache.put(position(2), (84, 64), 20, 4)
+    assert cache.get(position(2)).move == (85, 65)
+
+
+@pytest.mark.parametrize('magic, version', [(b'XXXX', VERSION), (MAGIC, VERSION + 1)])
+def test_unknown_format_is_ignored(path, magic, version):
+    cache = PositionCache(path)
+    cache.put(position(1), (85, 65), 40, 7)
+    cache.save()
+    with open(path, 'r+b') as f:
+        f.write(HEADER.pack(magic, version, 1))
+
+    loaded = PositionCache(path)
+    assert not loaded.entries
+    #the next save replaces the file with a readable one
+    loaded.put(position(2), (85, 65), 0, 1)
+    loaded.save()
+    assert PositionCache(path).get(position(2)) is not None
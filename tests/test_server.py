@@ -0,0 +1,22 @@
+import os
+
+import pytest
+
+sunfish = pytest.importorskip('sunfish')
+pytest.importorskip('cv2')
+
+from positionCache import PositionCache
+from server import EnginePool
+
+
+def test_cache_is_saved_in_the_background(tmp_path):
+    path = str(tmp_path / 'positions.bin')
+    pool = EnginePool(1, PositionCache(path), save_interval=3600)
+    try:
+        pos = sunfish.Position(sunfish.initial, 0, (True,True), (True,True), 0, 0)
+        depth, move, score = pool.search(pos, [pos], 0.2)
+        #the board that searched doesn't wait for the disk
+        assert not os.path.exists(path)
+    finally:
+        pool.shutdown()
+    assert PositionCache(path).get(pos).move == move
@@ -0,0 +1,18 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip('sunfish')
+pytest.importorskip('cv2')
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+
+
+def test_check_passes():
+    #the accuracy gate with its default thresholds; fewer timing repeats, they aren't checked
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(p for p in (SRC, os.environ.get('PYTHONPATH')) if p))
+    run = subprocess.run([sys.executable, 'visionBenchmark.py', '--check', '--repeats', '2'],
+                         cwd=SRC, env=env, capture_output=True, text=True, timeout=900)
+    assert run.returncode == 0, run.stdout + run.stderr